@@ -0,0 +1,377 @@
+import json
+import os
+import threading
+import numpy as np
+import pandas as pd
+from typing import Dict, Hashable, Iterator, List, Optional, Tuple
+from urllib.parse import quote, unquote
+
+COLUMNAS = ('voltageReceiver1', 'voltageReceiver2', 'status')
+ESTADISTICOS_MINUTO = ('min', 'media', 'max')
+SENSOR_POR_DEFECTO = 'general'
+
+NS_MINUTO = 60 * 10**9
+NS_DIA = 86_400 * 10**9
+_MIN_NS = np.iinfo(np.int64).min
+_MAX_NS = np.iinfo(np.int64).max
+
+# Por columna y minuto se guardan suma, nº de valores válidos, mínimo y máximo
+_ANCHO_AGREGADOS = 4 * len(COLUMNAS)
+
+
+class AlmacenHistorico:
+    """
+    Histórico persistente de lecturas pivotadas, particionado por sensor y día (UTC):
+        <directorio>/<sensor>/<AAAA-MM-DD>/{ts_ns,voltageReceiver1,...}.bin
+    Cada partición guarda sus columnas como binario plano (int64 ordenado para el
+    tiempo, float64 para el resto), así que anexar en orden es escribir al final y
+    las consultas por rango abren las columnas con memmap y cortan con búsqueda binaria.
+    Los agregados por minuto (min/media/max) se calculan al anexar; el último minuto,
+    que el siguiente anexado aún puede completar, se guarda en el propio JSON.
+    El 'particion.json' de cada partición marca cuántas filas y minutos son válidos y
+    qué fichero tiene cada columna: lo que haya detrás (una escritura interrumpida) se
+    ignora y se sobrescribe, y lo ya publicado nunca se modifica en sitio; si hay que
+    reescribirlo se hace en un fichero nuevo que se publica al actualizar el JSON.
+    Los ficheros sustituidos se borran al empezar el anexado siguiente, así que un
+    lector que acaba de leer el JSON anterior aún puede abrirlos.
+    """
+
+    VERSION = 1
+    FICHERO_META = 'meta.json'
+    FICHERO_PARTICION = 'particion.json'
+
+    def __init__(self, directorio: str):
+        self.directorio = directorio
+        os.makedirs(directorio, exist_ok=True)
+        self._lock = threading.Lock()
+        self._meta = _leer_json(os.path.join(directorio, self.FICHERO_META),
+                                {'version': self.VERSION, 'fuentes': []})
+
+    # --- Escritura ---
+    def anexar(self, df: pd.DataFrame, sensor: Optional[Hashable] = None) -> int:
+        """
+        Añade un DataFrame pivotado (timestamp + COLUMNAS). Si trae columna 'sensor'
+        y no se indica 'sensor', cada grupo va a su partición. Devuelve las filas añadidas.
+        """
+        if df is None or df.empty:
+            return 0
+        if sensor is None and 'sensor' in df.columns:
+            return sum(self.anexar(grupo, s) for s, grupo in df.groupby('sensor', sort=False))
+
+        sensor = SENSOR_POR_DEFECTO if sensor is None else sensor
+        ts_ns = df['timestamp'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+        valores = {col: df[col].to_numpy(dtype=np.float64) if col in df.columns
+                   else np.full(len(df), np.nan) for col in COLUMNAS}
+        if np.any(ts_ns[1:] < ts_ns[:-1]):
+            orden = np.argsort(ts_ns, kind='stable')
+            ts_ns = ts_ns[orden]
+            valores = {col: x[orden] for col, x in valores.items()}
+
+        # Un tramo por día: las lecturas ya ordenadas caen en días consecutivos
+        dias = ts_ns // NS_DIA
+        cortes = np.flatnonzero(dias[1:] != dias[:-1]) + 1
+        with self._lock:
+            for inicio, fin in zip(np.r_[0, cortes], np.r_[cortes, len(ts_ns)]):
+                ruta = self._ruta_particion(sensor, int(dias[inicio]))
+                self._anexar_particion(ruta, ts_ns[inicio:fin],
+                                       {col: x[inicio:fin] for col, x in valores.items()})
+        return len(ts_ns)
+
+    def tiene_fuente(self, firma: str) -> bool:
+        return firma in self._meta['fuentes']
+
+    def registrar_fuente(self, firma: str):
+        """Marca un fichero origen como ingerido (para no duplicarlo al volver a cargarlo)."""
+        with self._lock:
+            if firma not in self._meta['fuentes']:
+                self._meta['fuentes'].append(firma)
+                _escribir_json(os.path.join(self.directorio, self.FICHERO_META), self._meta)
+
+    def _anexar_particion(self, ruta: str, ts_ns: np.ndarray, valores: Dict[str, np.ndarray]):
+        os.makedirs(ruta, exist_ok=True)
+        meta = _leer_json(os.path.join(ruta, self.FICHERO_PARTICION), {'filas': 0, 'minutos': 0})
+        _borrar_sustituidos(ruta, meta)
+        n = meta['filas']
+        # Último minuto publicado (en el JSON); las particiones antiguas lo tienen en el fichero
+        ultimo = meta.get('ultimo_minuto')
+        generacion = meta.get('generacion', 0) + 1
+        nueva = {'ficheros': dict(meta.get('ficheros', {})), 'generacion': generacion}
+        existentes = _abrir(ruta, meta, 'ts_ns', np.int64, n)
+
+        if n and ts_ns[0] < existentes[-1]:
+            # 1a. Llegan lecturas anteriores a las guardadas: se fusiona y se reescribe la
+            # partición en ficheros nuevos (los publicados siguen intactos hasta el paso 4)
+            todas_ts = np.concatenate([existentes, ts_ns])
+            todas = {col: np.concatenate([_abrir(ruta, meta, col, np.float64, n), x]) for col, x in valores.items()}
+            orden = np.argsort(todas_ts, kind='stable')
+            ts_ns = todas_ts[orden]
+            valores = {col: x[orden] for col, x in todas.items()}
+            for nombre in ('ts_ns', *COLUMNAS):
+                nueva['ficheros'][nombre] = f"{nombre}.{generacion}"
+            n = desde = minutos_conservados = 0
+            ultimo = None
+        else:
+            # 1b. En orden: se escribe al final y se recalculan los minutos desde el primero
+            # que tocan las lecturas nuevas (el último guardado podía estar incompleto)
+            minuto = ts_ns[0] - ts_ns[0] % NS_MINUTO
+            if ultimo is not None and ultimo['minuto'] == minuto:
+                ultimo = None  # Se recalcula con las lecturas nuevas
+            desde = int(np.searchsorted(existentes, minuto, side='left'))
+            minutos = _abrir(ruta, meta, 'minutos', np.int64, meta['minutos'])
+            minutos_conservados = int(np.searchsorted(minutos, minuto, side='left'))
+            del minutos
+        del existentes
+
+        # 2. Columnas crudas (detrás de las 'n' filas publicadas, o en los ficheros nuevos)
+        _escribir(ruta, nueva, 'ts_ns', ts_ns, n)
+        for col, x in valores.items():
+            _escribir(ruta, nueva, col, x, n)
+        total = n + len(ts_ns)
+
+        # 3. Agregados por minuto de la cola afectada
+        cola_ts = _abrir(ruta, nueva, 'ts_ns', np.int64, total)[desde:]
+        cola = {col: _abrir(ruta, nueva, col, np.float64, total)[desde:] for col in COLUMNAS}
+        minutos, agregados = _agregar_minutos(cola_ts, cola)
+        del cola_ts, cola
+        # El último minuto va al JSON; al fichero, solo los cerrados (el que estaba en el
+        # JSON queda cerrado si las lecturas nuevas empiezan en un minuto posterior)
+        nueva['ultimo_minuto'] = {'minuto': int(minutos[-1]), 'agregados': agregados[-1].tolist()}
+        minutos, agregados = minutos[:-1], agregados[:-1].ravel()
+        if ultimo is not None:
+            minutos = np.r_[ultimo['minuto'], minutos]
+            agregados = np.r_[ultimo['agregados'], agregados]
+        if minutos_conservados < meta['minutos']:
+            # Se recalcula algún minuto del fichero (fusión o partición antigua): los
+            # agregados van a ficheros nuevos con los minutos conservados delante
+            minutos = np.concatenate([_abrir(ruta, meta, 'minutos', np.int64, minutos_conservados), minutos])
+            agregados = np.concatenate([_abrir(ruta, meta, 'agregados', np.float64,
+                                               minutos_conservados * _ANCHO_AGREGADOS), agregados])
+            for nombre in ('minutos', 'agregados'):
+                nueva['ficheros'][nombre] = f"{nombre}.{generacion}"
+            minutos_conservados = 0
+        _escribir(ruta, nueva, 'minutos', minutos, minutos_conservados)
+        _escribir(ruta, nueva, 'agregados', agregados, minutos_conservados * _ANCHO_AGREGADOS)
+
+        # 4. Publicar las nuevas longitudes y ficheros (hasta aquí, un lector sigue viendo los anteriores)
+        nueva.update(filas=total, minutos=minutos_conservados + len(minutos))
+        _escribir_json(os.path.join(ruta, self.FICHERO_PARTICION), nueva)
+
+    # --- Consulta ---
+    def sensores(self) -> List[str]:
+        return sorted(unquote(nombre) for nombre in os.listdir(self.directorio)
+                      if os.path.isdir(os.path.join(self.directorio, nombre)))
+
+    def obtener_rango(self, inicio=None, fin=None, sensor: Optional[Hashable] = None) -> pd.DataFrame:
+        """
+        Lecturas con inicio <= timestamp < fin (None: sin límite). Con 'sensor' devuelve
+        su serie (mismo formato que LectorCSV.leer); sin él, todas las series ordenadas por
+        tiempo con una columna 'sensor' adicional.
+        """
+        ini_ns, fin_ns = _a_ns(inicio, _MIN_NS), _a_ns(fin, _MAX_NS)
+        partes = []
+        for s in self._sensores_consulta(sensor):
+            for ruta, meta in self._particiones(s, ini_ns, fin_ns):
+                ts_ns = _abrir(ruta, meta, 'ts_ns', np.int64, meta['filas'])
+                a, b = np.searchsorted(ts_ns, [ini_ns, fin_ns], side='left')
+                if b > a:
+                    columnas = {col: np.array(_abrir(ruta, meta, col, np.float64, meta['filas'])[a:b])
+                                for col in COLUMNAS}
+                    partes.append((s, np.array(ts_ns[a:b]), columnas))
+        return self._a_dataframe(partes, COLUMNAS, sensor is None)
+
+    def agregados(self, inicio=None, fin=None, sensor: Optional[Hashable] = None) -> pd.DataFrame:
+        """
+        Agregados por minuto precalculados: 'timestamp' (inicio del minuto), 'lecturas'
+        y <columna>_min/_media/_max, para los minutos que empiezan en [inicio, fin).
+        """
+        ini_ns, fin_ns = _a_ns(inicio, _MIN_NS), _a_ns(fin, _MAX_NS)
+        if ini_ns != _MIN_NS:
+            ini_ns -= ini_ns % NS_MINUTO
+        nombres = [f"{col}_{est}" for col in COLUMNAS for est in ESTADISTICOS_MINUTO]
+        partes = []
+        for s in self._sensores_consulta(sensor):
+            for ruta, meta in self._particiones(s, ini_ns, fin_ns):
+                minutos, bruto = _minutos_particion(ruta, meta)
+                a, b = np.searchsorted(minutos, [ini_ns, fin_ns], side='left')
+                if b <= a:
+                    continue
+                bloque = np.array(bruto[a:b])
+                # Lecturas del minuto: las de la columna con más valores válidos
+                columnas = {'lecturas': bloque[:, 1::4].max(axis=1).astype(np.int64)}
+                for k, col in enumerate(COLUMNAS):
+                    suma, validos, minimo, maximo = bloque[:, 4 * k:4 * k + 4].T
+                    with np.errstate(divide='ignore', invalid='ignore'):
+                        media = np.where(validos > 0, suma / validos, np.nan)
+                    columnas.update(zip([f"{col}_{est}" for est in ESTADISTICOS_MINUTO],
+                                        [minimo, media, maximo]))
+                partes.append((s, np.array(minutos[a:b]), columnas))
+        return self._a_dataframe(partes, ['lecturas'] + nombres, sensor is None)
+
+    def tendencia(self, inicio=None, fin=None, sensor: Optional[Hashable] = None) -> pd.DataFrame:
+        """
+        Serie de un sensor (por defecto SENSOR_POR_DEFECTO) para generar_grafica_tendencia a partir
+        de los agregados: dos puntos por minuto (mínimo y máximo), así la gráfica conserva los
+        picos sin leer las lecturas.
+        """
+        agregados = self.agregados(inicio, fin, SENSOR_POR_DEFECTO if sensor is None else sensor)
+        columnas = {'timestamp': np.repeat(agregados['timestamp'].to_numpy(), 2)}
+        for col in ('voltageReceiver1', 'voltageReceiver2'):
+            columnas[col] = np.column_stack([agregados[f"{col}_min"].to_numpy(),
+                                             agregados[f"{col}_max"].to_numpy()]).ravel()
+        return pd.DataFrame(columnas)
+
+    def leer_stream(self, inicio=None, fin=None, sensor: Optional[Hashable] = None) -> Iterator[pd.DataFrame]:
+        """
+        Un DataFrame por partición (sensor y día) en orden cronológico dentro de cada sensor,
+        para recorrer el histórico con memoria acotada (p. ej. entrenar_stream).
+        El primer bloque de cada sensor lleva attrs['nueva_serie'] = True.
+        """
+        ini_ns, fin_ns = _a_ns(inicio, _MIN_NS), _a_ns(fin, _MAX_NS)
+        for s in self._sensores_consulta(sensor):
+            primero = True
+            for ruta, meta in self._particiones(s, ini_ns, fin_ns):
+                ts_ns = _abrir(ruta, meta, 'ts_ns', np.int64, meta['filas'])
+                a, b = np.searchsorted(ts_ns, [ini_ns, fin_ns], side='left')
+                if b <= a:
+                    continue
+                columnas = {col: np.array(_abrir(ruta, meta, col, np.float64, meta['filas'])[a:b]) for col in COLUMNAS}
+                bloque = self._a_dataframe([(s, np.array(ts_ns[a:b]), columnas)], COLUMNAS, False)
+                bloque.attrs['nueva_serie'] = primero
+                primero = False
+                yield bloque
+
+    def rango_temporal(self, sensor: Optional[Hashable] = None) -> Optional[Tuple[pd.Timestamp, pd.Timestamp]]:
+        """Primera y última lectura guardadas (None si el histórico está vacío)."""
+        extremos = []
+        for s in self._sensores_consulta(sensor):
+            particiones = self._particiones(s, _MIN_NS, _MAX_NS)
+            if particiones:
+                (ruta_a, meta_a), (ruta_b, meta_b) = particiones[0], particiones[-1]
+                extremos.append((int(_abrir(ruta_a, meta_a, 'ts_ns', np.int64, meta_a['filas'])[0]),
+                                 int(_abrir(ruta_b, meta_b, 'ts_ns', np.int64, meta_b['filas'])[-1])))
+        if not extremos:
+            return None
+        return pd.Timestamp(min(a for a, _ in extremos)), pd.Timestamp(max(b for _, b in extremos))
+
+    def _sensores_consulta(self, sensor: Optional[Hashable]) -> List[Hashable]:
+        return self.sensores() if sensor is None else [sensor]
+
+    def _ruta_particion(self, sensor: Hashable, dia: int) -> str:
+        fecha = np.datetime64(dia, 'D').astype(str)
+        return os.path.join(self.directorio, quote(str(sensor), safe=''), fecha)
+
+    def _particiones(self, sensor: Hashable, ini_ns: int, fin_ns: int) -> List[Tuple[str, Dict]]:
+        """Particiones no vacías del sensor que se solapan con [ini_ns, fin_ns), por fecha."""
+        directorio = os.path.join(self.directorio, quote(str(sensor), safe=''))
+        if not os.path.isdir(directorio):
+            return []
+        particiones = []
+        for fecha in sorted(os.listdir(directorio)):
+            dia_ns = int(np.datetime64(fecha, 'D').astype('datetime64[ns]').view(np.int64))
+            if dia_ns >= fin_ns or dia_ns + NS_DIA <= ini_ns:
+                continue
+            ruta = os.path.join(directorio, fecha)
+            meta = _leer_json(os.path.join(ruta, self.FICHERO_PARTICION), {'filas': 0, 'minutos': 0})
+            if meta['filas']:
+                particiones.append((ruta, meta))
+        return particiones
+
+    @staticmethod
+    def _a_dataframe(partes: List, nombres, con_sensor: bool) -> pd.DataFrame:
+        if not partes:
+            return pd.DataFrame(columns=['timestamp', *nombres] + (['sensor'] if con_sensor else []))
+        ts_ns = np.concatenate([ts for _, ts, _ in partes])
+        columnas = {'timestamp': ts_ns.view('datetime64[ns]')}
+        for nombre in nombres:
+            columnas[nombre] = np.concatenate([c[nombre] for _, _, c in partes])
+        if con_sensor:
+            columnas['sensor'] = np.concatenate([np.full(len(ts), s, dtype=object) for s, ts, _ in partes])
+            df = pd.DataFrame(columnas)
+            # Cada serie ya viene ordenada: el orden estable intercala sin desordenar ninguna
+            return df.iloc[np.argsort(ts_ns, kind='stable')].reset_index(drop=True)
+        return pd.DataFrame(columnas)
+
+
+def _agregar_minutos(ts_ns: np.ndarray, valores: Dict[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """Suma, válidos, mínimo y máximo por minuto de cada columna (ignorando NaN)."""
+    if len(ts_ns) == 0:
+        return np.empty(0, dtype=np.int64), np.empty((0, _ANCHO_AGREGADOS))
+    minuto = ts_ns - ts_ns % NS_MINUTO
+    inicio = np.flatnonzero(np.r_[True, minuto[1:] != minuto[:-1]])
+    bloques = []
+    for col in COLUMNAS:
+        x = np.asarray(valores[col])
+        valido = ~np.isnan(x)
+        bloques += [np.add.reduceat(np.where(valido, x, 0.0), inicio),
+                    np.add.reduceat(valido.astype(np.float64), inicio),
+                    np.fmin.reduceat(x, inicio),
+                    np.fmax.reduceat(x, inicio)]
+    return minuto[inicio], np.column_stack(bloques)
+
+
+def _minutos_particion(ruta: str, meta: Dict) -> Tuple[np.ndarray, np.ndarray]:
+    """Minutos y agregados (una fila por minuto): los cerrados del fichero y el último del JSON."""
+    minutos = _abrir(ruta, meta, 'minutos', np.int64, meta['minutos'])
+    agregados = _abrir(ruta, meta, 'agregados', np.float64,
+                       meta['minutos'] * _ANCHO_AGREGADOS).reshape(-1, _ANCHO_AGREGADOS)
+    ultimo = meta.get('ultimo_minuto')
+    if ultimo is None:
+        return minutos, agregados
+    return np.r_[minutos, ultimo['minuto']], np.vstack([agregados, ultimo['agregados']])
+
+
+def _borrar_sustituidos(ruta: str, meta: Dict):
+    """Borra los .bin que el JSON publicado ya no referencia (sustituidos o de un anexado interrumpido)."""
+    vigentes = {f"{_fichero(meta, nombre)}.bin" for nombre in ('ts_ns', *COLUMNAS, 'minutos', 'agregados')}
+    for fichero in os.listdir(ruta):
+        if fichero.endswith('.bin') and fichero not in vigentes:
+            try:
+                os.remove(os.path.join(ruta, fichero))
+            except FileNotFoundError:
+                pass
+
+
+def _fichero(meta: Dict, nombre: str) -> str:
+    """Fichero actual de una columna según el JSON de la partición (sin '.bin')."""
+    return meta.get('ficheros', {}).get(nombre, nombre)
+
+
+def _ruta_columna(ruta: str, meta: Dict, nombre: str) -> str:
+    return os.path.join(ruta, f"{_fichero(meta, nombre)}.bin")
+
+
+def _abrir(ruta: str, meta: Dict, nombre: str, dtype, n: int) -> np.ndarray:
+    """Las 'n' primeras posiciones válidas de una columna, con memmap (sin leerla entera)."""
+    if n == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(_ruta_columna(ruta, meta, nombre), dtype=dtype, mode='r', shape=(n,))
+
+
+def _escribir(ruta: str, meta: Dict, nombre: str, valores: np.ndarray, posicion: int):
+    """Escribe 'valores' a partir del elemento 'posicion', descartando lo que hubiera detrás."""
+    fichero = _ruta_columna(ruta, meta, nombre)
+    with open(fichero, 'r+b' if os.path.exists(fichero) else 'wb') as f:
+        f.truncate(posicion * valores.itemsize)
+        f.seek(posicion * valores.itemsize)
+        np.ascontiguousarray(valores).tofile(f)
+
+
+def _a_ns(instante, por_defecto: int) -> int:
+    if instante is None:
+        return por_defecto
+    return int(pd.Timestamp(instante).as_unit('ns').value)
+
+
+def _leer_json(ruta: str, por_defecto: Dict) -> Dict:
+    try:
+        with open(ruta, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return dict(por_defecto)
+
+
+def _escribir_json(ruta: str, datos: Dict):
+    temporal = f"{ruta}.tmp"
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(datos, f)
+    os.replace(temporal, ruta)
@@ -0,0 +1,87 @@
+import threading
+import numpy as np
+from collections import Counter, deque
+from typing import Dict, Iterable, List, Union
+from incidencias import BufferIncidencias, ETIQUETAS, Incidencia
+
+
+class AlmacenIncidencias:
+    """
+    Agregados de incidencias mantenidos al vuelo: conteos por tipo, por sensor y por
+    cubeta temporal, más un anillo acotado con el detalle de las más recientes.
+    Registrar cuesta O(1) por incidencia y los informes se sirven de los contadores,
+    sin recorrer ni guardar la lista completa.
+    """
+
+    def __init__(self, max_recientes: int = 1000, cubeta_segundos: int = 3600):
+        self.cubeta_ns = int(cubeta_segundos * 1e9)
+        self.por_tipo: Counter = Counter()
+        self.por_sensor: Counter = Counter()
+        self.por_cubeta: Counter = Counter()  # inicio de la cubeta (ns) -> nº de incidencias
+        self.recientes = deque(maxlen=max_recientes)
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def registrar(self, incidencias: Union[BufferIncidencias, Iterable[Incidencia]]) -> int:
+        """Incorpora un lote de incidencias; devuelve cuántas se registraron."""
+        if isinstance(incidencias, BufferIncidencias):
+            return self._registrar_buffer(incidencias)
+
+        n = 0
+        with self._lock:
+            for incidencia in incidencias:
+                self.por_tipo[incidencia.tipo] += 1
+                if incidencia.sensor is not None:
+                    self.por_sensor[incidencia.sensor] += 1
+                ts_ns = incidencia.ts_ns
+                self.por_cubeta[ts_ns - ts_ns % self.cubeta_ns] += 1
+                self.recientes.append(incidencia)
+                n += 1
+            self.total += n
+        return n
+
+    def _registrar_buffer(self, buffer: BufferIncidencias) -> int:
+        """Mismos agregados que registrar, contados por columnas."""
+        n = len(buffer)
+        if n == 0:
+            return 0
+        conteo_tipos = np.bincount(buffer.codigos, minlength=len(ETIQUETAS))
+        cubetas, conteo_cubetas = np.unique(buffer.ts_ns - buffer.ts_ns % self.cubeta_ns, return_counts=True)
+        sensores = buffer.sensores()
+        with self._lock:
+            self.por_tipo.update({ETIQUETAS[c]: int(k) for c, k in enumerate(conteo_tipos) if k})
+            self.por_cubeta.update(dict(zip(cubetas.tolist(), conteo_cubetas.tolist())))
+            if sensores is not None:
+                self.por_sensor.update(Counter(s for s in sensores if s is not None))
+            # Solo se materializan como registros las que caben en el anillo
+            maximo = self.recientes.maxlen or n
+            self.recientes.extend(buffer[i] for i in range(max(0, n - maximo), n))
+            self.total += n
+        return n
+
+    def conteo_tipos(self) -> Counter:
+        with self._lock:
+            return self.por_tipo.copy()
+
+    def ultimas(self, n: int = 20) -> List[Incidencia]:
+        """Detalle de las 'n' incidencias más recientes (como mucho max_recientes)."""
+        with self._lock:
+            return list(self.recientes)[-n:]
+
+    def resumen(self) -> Dict:
+        import pandas as pd
+        with self._lock:
+            return {
+                'total': self.total,
+                'por_tipo': dict(self.por_tipo.most_common()),
+                'por_sensor': dict(self.por_sensor.most_common()),
+                'por_cubeta': {pd.Timestamp(inicio): n for inicio, n in sorted(self.por_cubeta.items())}
+            }
+
+    def reiniciar(self):
+        with self._lock:
+            self.por_tipo.clear()
+            self.por_sensor.clear()
+            self.por_cubeta.clear()
+            self.recientes.clear()
+            self.total = 0
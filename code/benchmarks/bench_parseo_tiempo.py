@@ -0,0 +1,53 @@
+import os
+import sys
+import time
+import pandas as pd
+
+# --- CONFIGURACIÓN DE RUTAS ---
+DIR_BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+DIR_CODE = os.path.dirname(DIR_BENCHMARKS)
+sys.path.append(DIR_CODE)
+
+try:
+    from parser_tiempo import ParserTiempo
+except ImportError:
+    sys.exit("❌ No se encuentra el módulo ParserTiempo.")
+
+
+def cronometrar(funcion, repeticiones: int = 3) -> float:
+    """Mejor tiempo (segundos) de varias repeticiones."""
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
+
+
+def main():
+    RUTA_DATOS = sys.argv[1] if len(sys.argv) > 1 else os.path.join(DIR_CODE, "experimets", "data", "Dataset-CV.csv")
+    if not os.path.exists(RUTA_DATOS):
+        sys.exit(f"❌ No se encuentra el archivo en: {RUTA_DATOS}")
+
+    tiempos = pd.read_csv(RUTA_DATOS, sep=';', usecols=['tiempo'])['tiempo']
+    print(f"--- BENCHMARK PARSEO DE TIEMPO ({len(tiempos)} valores) ---")
+
+    # 1. COLUMNA COMPLETA: inferencia (dayfirst) vs formato detectado y cacheado
+    t_inferido = cronometrar(lambda: pd.to_datetime(tiempos, dayfirst=True))
+    parser = ParserTiempo()
+    parser.parsear_columna(tiempos.head(parser.tam_muestra))  # Detección (una sola vez)
+    t_formato = cronometrar(lambda: parser.parsear_columna(tiempos))
+    print(f"Formato detectado: {parser.formato}")
+    print(f"Columna  | inferido: {t_inferido:.3f}s | formato fijo: {t_formato:.3f}s "
+          f"| x{t_inferido / t_formato:.1f}")
+
+    # 2. LECTURA A LECTURA: lo que hace predecir_tiempo_real por cada dato
+    muestra = tiempos.head(20_000).astype(str).tolist()
+    t_pandas = cronometrar(lambda: [pd.to_datetime(v, dayfirst=True) for v in muestra], repeticiones=1)
+    t_escalar = cronometrar(lambda: [parser.parsear_escalar(v) for v in muestra])
+    print(f"Escalar  | pandas: {t_pandas / len(muestra) * 1e6:.1f}us | "
+          f"ParserTiempo: {t_escalar / len(muestra) * 1e6:.1f}us | x{t_pandas / t_escalar:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import argparse
+import asyncio
+import collections
+import json
+import os
+import subprocess
+import sys
+import time
+import numpy as np
+
+# --- CONFIGURACIÓN DE RUTAS ---
+DIR_BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+DIR_CODE = os.path.dirname(DIR_BENCHMARKS)
+sys.path.append(DIR_CODE)
+
+try:
+    from servidor_ingesta import DTYPE_BINARIO, CABECERA_BINARIA, ACK_BINARIO
+    from generador_sintetico import generar_lecturas
+except ImportError as e:
+    sys.exit(f"❌ No se encuentran los módulos del sistema: {e}")
+
+
+def preparar_frames(total: int, tam_frame: int, num_sensores: int, formato: str):
+    """Pre-serializa todas las lecturas para que el cliente no sea el cuello de botella."""
+    lecturas = generar_lecturas(total)
+    datos = np.zeros(total, dtype=DTYPE_BINARIO)
+    datos['seq'] = np.arange(total)
+    datos['sensor'] = np.arange(total) % num_sensores
+    datos['timestamp'] = lecturas['timestamp'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+    datos['voltageReceiver1'] = lecturas['voltageReceiver1'].to_numpy() * 1000.0
+    datos['voltageReceiver2'] = lecturas['voltageReceiver2'].to_numpy() * 1000.0
+    datos['status'] = lecturas['status'].to_numpy()
+
+    frames = []
+    for inicio in range(0, total, tam_frame):
+        bloque = datos[inicio:inicio + tam_frame]
+        if formato == 'binario':
+            cuerpo = CABECERA_BINARIA.pack(len(bloque)) + bloque.tobytes()
+        else:
+            cuerpo = b''.join(
+                json.dumps({nombre: fila[nombre].item() for nombre in DTYPE_BINARIO.names}).encode() + b'\n'
+                for fila in bloque)
+        frames.append((int(bloque['seq'][-1]), cuerpo))
+    return frames
+
+
+async def ejecutar(args):
+    frames = preparar_frames(args.lecturas, args.tam_frame, args.sensores, args.formato)
+    if args.unix:
+        reader, writer = await asyncio.open_unix_connection(args.unix)
+    else:
+        host, puerto = args.tcp.rsplit(':', 1)
+        reader, writer = await asyncio.open_connection(host, int(puerto))
+
+    pendientes = collections.deque()  # (último seq del frame, instante de envío)
+    latencias = []
+    ultimo_ack = -1
+    todo_confirmado = asyncio.Event()
+
+    async def leer_acks():
+        nonlocal ultimo_ack
+        while ultimo_ack < args.lecturas - 1:
+            if args.formato == 'binario':
+                (ack,) = ACK_BINARIO.unpack(await reader.readexactly(ACK_BINARIO.size))
+            else:
+                linea = await reader.readline()
+                if not linea:
+                    break
+                ack = json.loads(linea)['ack']
+            ahora = time.perf_counter()
+            ultimo_ack = ack
+            while pendientes and pendientes[0][0] <= ack:
+                latencias.append(ahora - pendientes.popleft()[1])
+        todo_confirmado.set()
+
+    lector = asyncio.create_task(leer_acks())
+    inicio = time.perf_counter()
+    for i, (seq, cuerpo) in enumerate(frames):
+        if args.tasa:
+            # Ritmo objetivo en lecturas/s
+            objetivo = inicio + (i * args.tam_frame) / args.tasa
+            espera = objetivo - time.perf_counter()
+            if espera > 0:
+                await asyncio.sleep(espera)
+        pendientes.append((seq, time.perf_counter()))
+        writer.write(cuerpo)
+        await writer.drain()  # Backpressure del servidor
+
+    try:
+        await asyncio.wait_for(todo_confirmado.wait(), args.timeout)
+    except asyncio.TimeoutError:
+        print(f"⚠️  Timeout esperando confirmaciones (último ack {ultimo_ack}).")
+    duracion = time.perf_counter() - inicio
+    lector.cancel()
+    writer.close()
+
+    confirmadas = ultimo_ack + 1
+    print(f"--- GENERADOR DE CARGA ({args.formato}, frames de {args.tam_frame}) ---")
+    print(f"Lecturas confirmadas: {confirmadas}/{args.lecturas} en {duracion:.2f}s "
+          f"-> {confirmadas / duracion:,.0f} lecturas/s")
+    if latencias:
+        p50, p99, p999 = np.percentile(latencias, [50, 99, 99.9]) * 1e3
+        print(f"Latencia por frame (ms): p50 {p50:.2f} | p99 {p99:.2f} | p99.9 {p999:.2f} "
+              f"| máx {max(latencias) * 1e3:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cliente de carga para servidor_ingesta.py")
+    parser.add_argument('--tcp', default='127.0.0.1:9009', help="host:puerto")
+    parser.add_argument('--unix', help="Ruta de socket Unix (sustituye a --tcp)")
+    parser.add_argument('--formato', choices=['ndjson', 'binario'], default='binario')
+    parser.add_argument('--lecturas', type=int, default=200_000)
+    parser.add_argument('--tam-frame', type=int, default=100)
+    parser.add_argument('--sensores', type=int, default=1)
+    parser.add_argument('--tasa', type=float, default=0, help="Lecturas/s objetivo (0 = máximo)")
+    parser.add_argument('--timeout', type=float, default=60)
+    parser.add_argument('--servidor-local', action='store_true',
+                        help="Arranca servidor_ingesta.py en un subproceso para la prueba")
+    args = parser.parse_args()
+
+    servidor = None
+    if args.servidor_local:
+        destino = ['--unix', args.unix] if args.unix else ['--tcp', args.tcp]
+        servidor = subprocess.Popen([sys.executable, os.path.join(DIR_CODE, 'servidor_ingesta.py'),
+                                     '--formato', args.formato, *destino],
+                                    stdout=subprocess.DEVNULL)
+        time.sleep(3)  # Tiempo de arranque (imports de pandas/xgboost)
+    try:
+        asyncio.run(ejecutar(args))
+    finally:
+        if servidor is not None:
+            servidor.terminate()
+            servidor.wait()
+
+
+if __name__ == "__main__":
+    main()
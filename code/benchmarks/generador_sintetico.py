@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+
+def generar_lecturas(n: int, semilla: int = 0, inicio: str = "2024-03-01 00:00:00",
+                     prob_bloqueo: float = 0.002, prob_salto: float = 0.003) -> pd.DataFrame:
+    """
+    Genera n lecturas ya pivotadas (formato de salida de LectorCSV: Voltios, ordenadas)
+    con huecos de más de 120s (BLOQUEO_DATOS) y saltos de tensión (SALTO_VOLTAJE).
+    """
+    rng = np.random.default_rng(semilla)
+
+    # Una lectura cada 0.5-3s, con algún hueco largo
+    paso_ms = rng.integers(500, 3000, n).astype(np.int64)
+    paso_ms[rng.random(n) < prob_bloqueo] = 200_000
+    ts = pd.Timestamp(inicio).value + np.cumsum(paso_ms * 1_000_000)
+
+    v1 = 1.5 + np.cumsum(rng.normal(0, 0.005, n))
+    v2 = 1.4 + rng.normal(0, 0.02, n)
+    v1[rng.random(n) < prob_salto] += 0.9
+
+    return pd.DataFrame({
+        'timestamp': ts.view('datetime64[ns]'),
+        'status': np.ones(n),
+        'voltageReceiver1': v1,
+        'voltageReceiver2': v2
+    })
+
+
+def escribir_csv_crudo(lecturas: pd.DataFrame, ruta: str):
+    """Escribe las lecturas en el formato crudo de los sensores (filas mixtas, mV, ';')."""
+    n = len(lecturas)
+    tiempos = lecturas['timestamp'].dt.strftime("%d/%m/%Y %H:%M:%S.%f").str[:-3].to_numpy()
+    valores = np.column_stack([
+        lecturas['voltageReceiver1'].to_numpy() * 1000.0,
+        lecturas['voltageReceiver2'].to_numpy() * 1000.0,
+        lecturas['status'].to_numpy()
+    ])
+    pd.DataFrame({
+        'tiempo': np.repeat(tiempos, 3),
+        'medida': np.tile(['voltageReceiver1', 'voltageReceiver2', 'status'], n),
+        'valor': valores.ravel()
+    }).to_csv(ruta, sep=';', index=False)
+
+
+def a_lecturas_crudas(lecturas: pd.DataFrame) -> pd.DataFrame:
+    """Lecturas como llegan del sensor simulado (mV), para la inferencia en tiempo real."""
+    crudas = lecturas.copy()
+    crudas['voltageReceiver1'] = crudas['voltageReceiver1'] * 1000.0
+    crudas['voltageReceiver2'] = crudas['voltageReceiver2'] * 1000.0
+    return crudas
@@ -0,0 +1,292 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+# --- CONFIGURACIÓN DE RUTAS ---
+DIR_BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+DIR_CODE = os.path.dirname(DIR_BENCHMARKS)
+sys.path.append(DIR_CODE)
+
+try:
+    from lector_csv import LectorCSV
+    from modulo_inteligente import ModuloInteligente
+    from publisher import Publisher
+    from interfaces import Suscriber
+    from metricas import memoria_rss_mb
+    from generador_sintetico import generar_lecturas, escribir_csv_crudo, a_lecturas_crudas
+except ImportError as e:
+    sys.exit(f"❌ No se encuentran los módulos del sistema: {e}")
+
+
+# Dependencias pesadas que no deben cargarse al importar el sistema (se importan en su primer uso)
+MODULOS_PESADOS = ('pandas', 'xgboost', 'matplotlib', 'sklearn')
+
+
+class MedidorMemoria:
+    """Pico de RSS de una etapa, muestreando /proc/self/statm en un hilo aparte."""
+
+    def __init__(self, intervalo: float = 0.005):
+        self.intervalo = intervalo
+        self.inicial_mb = 0.0
+        self.pico_mb = 0.0
+        self._parar = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+
+    def __enter__(self):
+        self.inicial_mb = self.pico_mb = self._rss_mb()
+        self._parar.clear()
+        self._hilo = threading.Thread(target=self._muestrear, daemon=True)
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        self._hilo.join()
+        self.pico_mb = max(self.pico_mb, self._rss_mb())
+
+    def _muestrear(self):
+        while not self._parar.wait(self.intervalo):
+            self.pico_mb = max(self.pico_mb, self._rss_mb())
+
+    @staticmethod
+    def _rss_mb() -> float:
+        return memoria_rss_mb()
+
+
+class SuscriptorNulo(Suscriber):
+    def update(self, mensaje: str):
+        pass
+
+
+def medir(etapa: str, filas: int, funcion, **extra) -> Tuple[Dict, Any]:
+    """Ejecuta 'funcion' una vez midiendo tiempo y pico de memoria."""
+    with MedidorMemoria() as memoria:
+        inicio = time.perf_counter()
+        salida = funcion()
+        segundos = time.perf_counter() - inicio
+    resultado = {
+        'etapa': etapa,
+        'filas': filas,
+        'segundos': round(segundos, 6),
+        'filas_por_seg': round(filas / segundos, 1) if segundos > 0 else None,
+        'pico_rss_mb': round(memoria.pico_mb, 1),
+        'incremento_rss_mb': round(memoria.pico_mb - memoria.inicial_mb, 1),
+        **extra
+    }
+    print(f"  {etapa:<24} {filas:>10} filas  {segundos:9.3f}s  pico {memoria.pico_mb:8.1f} MB")
+    return resultado, salida
+
+
+def latencias_tiempo_real(modulo: ModuloInteligente, crudas, max_lecturas: int) -> Dict:
+    """Latencia dato a dato de predecir_tiempo_real (percentiles en microsegundos)."""
+    lecturas = crudas.head(max_lecturas).to_dict('records')
+    modulo.ultimo_estado = None
+    tiempos = np.empty(len(lecturas))
+    for i, lectura in enumerate(lecturas):
+        inicio = time.perf_counter()
+        modulo.predecir_tiempo_real(lectura)
+        tiempos[i] = time.perf_counter() - inicio
+    p50, p99, p999 = np.percentile(tiempos, [50, 99, 99.9]) * 1e6
+    return {'p50_us': round(p50, 1), 'p99_us': round(p99, 1), 'p999_us': round(p999, 1)}
+
+
+def benchmark_tamano(n: int, directorio: str, args) -> List[Dict]:
+    print(f"\n--- {n} filas ---")
+    resultados = []
+    lecturas = generar_lecturas(n)
+    ruta_csv = os.path.join(directorio, f"sintetico_{n}.csv")
+    escribir_csv_crudo(lecturas, ruta_csv)
+
+    # 1. Ingesta
+    r, df = medir('leer', n, lambda: LectorCSV(usar_cache=False).leer(ruta_csv))
+    resultados.append(r)
+    lector = LectorCSV()
+    lector.leer(ruta_csv)  # Genera la caché
+    r, _ = medir('leer_cache', n, lambda: lector.leer(ruta_csv))
+    resultados.append(r)
+
+    # 2. Entrenamiento
+    modulo = ModuloInteligente()
+    r, _ = medir('entrenar', n, lambda: modulo.entrenar(df))
+    resultados.append(r)
+
+    # 3. Detección por lotes
+    r, incidencias = medir('analizar_todo', n, lambda: modulo.analizar_todo(df))
+    r['incidencias'] = len(incidencias)
+    resultados.append(r)
+
+    # 4. Tiempo real: micro-lotes y dato a dato (muestra acotada, es lento por diseño)
+    crudas = a_lecturas_crudas(df)
+    modulo.ultimo_estado = None
+    r, _ = medir('predecir_lote', n, lambda: modulo.predecir_lote(crudas))
+    resultados.append(r)
+
+    muestra = min(n, args.max_tiempo_real)
+    r, latencias = medir('predecir_tiempo_real', muestra,
+                         lambda: latencias_tiempo_real(modulo, crudas, muestra))
+    r.update(latencias)
+    resultados.append(r)
+
+    os.remove(ruta_csv)
+    return resultados
+
+
+def benchmark_publisher(num_suscriptores: int, num_mensajes: int) -> List[Dict]:
+    print(f"\n--- Publisher: {num_suscriptores} suscriptores ---")
+    resultados = []
+    for asincrono in (False, True):
+        publisher = Publisher(asincrono=asincrono)
+        suscriptores = [SuscriptorNulo() for _ in range(num_suscriptores)]
+        with contextlib.redirect_stdout(io.StringIO()):  # Silencia el DEBUG de cada alta
+            for suscriptor in suscriptores:
+                publisher.suscribir(suscriptor, 'Mantenimiento')
+
+        def repartir():
+            for _ in range(num_mensajes):
+                publisher.notificar("Alerta", "Mantenimiento")
+            publisher.flush()
+
+        etapa = 'notificar_async' if asincrono else 'notificar'
+        r, _ = medir(etapa, num_suscriptores * num_mensajes, repartir,
+                     suscriptores=num_suscriptores, mensajes=num_mensajes)
+        resultados.append(r)
+        publisher.cerrar()
+    return resultados
+
+
+def medir_importacion(modulo: str) -> Tuple[float, Dict[str, int]]:
+    """
+    Importa 'modulo' en un intérprete nuevo con -X importtime.
+    Devuelve los segundos acumulados de su importación y el tiempo propio (µs) de cada módulo cargado.
+    """
+    proceso = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {modulo}"],
+                             cwd=DIR_CODE, capture_output=True, text=True, check=True)
+    propios: Dict[str, int] = {}
+    acumulado = 0
+    for linea in proceso.stderr.splitlines():
+        if not linea.startswith('import time:'):
+            continue
+        propio, total, nombre = linea[len('import time:'):].split('|')
+        if not propio.strip().isdigit():
+            continue  # Cabecera
+        nombre = nombre.strip()
+        propios[nombre] = int(propio)
+        if nombre == modulo:
+            acumulado = int(total)
+    return acumulado / 1e6, propios
+
+
+def benchmark_arranque(repeticiones: int) -> Tuple[List[Dict], List[str]]:
+    """
+    Coste de 'import sistema_transporte' (mínimo de varias ejecuciones, la primera compila .pyc).
+    Devuelve también las dependencias pesadas que se han cargado en el arranque.
+    """
+    print("\n--- Arranque: import sistema_transporte ---")
+    tiempos = []
+    propios: Dict[str, int] = {}
+    for _ in range(repeticiones):
+        segundos, propios = medir_importacion('sistema_transporte')
+        tiempos.append(segundos)
+    cargados = sorted({nombre.split('.')[0] for nombre in propios} & set(MODULOS_PESADOS))
+    segundos = min(tiempos)
+    print(f"  {'importar_sistema':<24} {len(propios):>10} módulos {segundos:9.3f}s  "
+          f"pesados: {', '.join(cargados) or 'ninguno'}")
+    resultado = {
+        'etapa': 'importar_sistema',
+        'filas': 1,
+        'segundos': round(segundos, 6),
+        'modulos': len(propios),
+        'modulos_pesados': cargados
+    }
+    return [resultado], cargados
+
+
+def comparar(actual: Dict, ruta_base: str, tolerancia: float) -> bool:
+    """Compara con un JSON anterior. Devuelve False si alguna etapa es más lenta de lo tolerado."""
+    with open(ruta_base, encoding='utf-8') as f:
+        base = json.load(f)
+    previos = {(r['etapa'], r['filas']): r for r in base['resultados']}
+
+    print(f"\n--- COMPARACIÓN con {base.get('commit', '?')} (tolerancia {tolerancia:.0%}) ---")
+    sin_regresiones = True
+    for r in actual['resultados']:
+        previo = previos.get((r['etapa'], r['filas']))
+        if previo is None or not previo['segundos']:
+            continue
+        ratio = r['segundos'] / previo['segundos']
+        marca = "⚠️  REGRESIÓN" if ratio > 1 + tolerancia else ""
+        sin_regresiones &= not marca
+        print(f"  {r['etapa']:<24} {r['filas']:>10}  x{ratio:5.2f}  {marca}")
+    return sin_regresiones
+
+
+def commit_actual() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=DIR_CODE,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'desconocido'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de ingesta, entrenamiento y detección.")
+    parser.add_argument('--tamanos', type=int, nargs='+', default=[10_000, 1_000_000, 10_000_000])
+    parser.add_argument('--max-tiempo-real', type=int, default=5_000,
+                        help="Lecturas medidas dato a dato con predecir_tiempo_real.")
+    parser.add_argument('--suscriptores', type=int, default=10_000)
+    parser.add_argument('--mensajes', type=int, default=20)
+    parser.add_argument('--salida', help="JSON de resultados (por defecto resultados/bench_<commit>.json).")
+    parser.add_argument('--comparar', help="JSON de un commit anterior para detectar regresiones.")
+    parser.add_argument('--tolerancia', type=float, default=0.2)
+    parser.add_argument('--repeticiones-arranque', type=int, default=5,
+                        help="Ejecuciones de 'import sistema_transporte' con -X importtime (se toma el mínimo).")
+    parser.add_argument('--solo-arranque', action='store_true',
+                        help="Mide solo el arranque (comprobación rápida de regresiones de importación).")
+    args = parser.parse_args()
+
+    commit = commit_actual()
+    informe = {
+        'commit': commit,
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count(),
+        'resultados': []
+    }
+
+    print(f"--- BENCHMARKS (commit {commit}) ---")
+    resultados_arranque, pesados = benchmark_arranque(args.repeticiones_arranque)
+    informe['resultados'].extend(resultados_arranque)
+    if not args.solo_arranque:
+        with tempfile.TemporaryDirectory() as directorio:
+            for n in args.tamanos:
+                informe['resultados'].extend(benchmark_tamano(n, directorio, args))
+        informe['resultados'].extend(benchmark_publisher(args.suscriptores, args.mensajes))
+
+    salida = args.salida or os.path.join(DIR_BENCHMARKS, 'resultados', f"bench_{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, 'w', encoding='utf-8') as f:
+        json.dump(informe, f, indent=2)
+    print(f"\nResultados guardados en {salida}")
+
+    if pesados:
+        print(f"\n⚠️  REGRESIÓN: importar sistema_transporte carga {', '.join(pesados)}")
+    if args.comparar and not comparar(informe, args.comparar, args.tolerancia):
+        sys.exit(1)
+    if pesados:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
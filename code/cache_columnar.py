@@ -0,0 +1,90 @@
+import json
+import os
+import shutil
+import uuid
+import numpy as np
+import pandas as pd
+from typing import Dict, Optional
+
+
+class CacheColumnar:
+    """
+    Caché binaria columnar de datasets ya pivotados, guardada junto al CSV origen.
+    Cada columna es un .npy que se abre con memory-mapping (copy-on-write), de modo
+    que las cargas repetidas no parsean nada y varios procesos comparten las páginas.
+    La caché se invalida si cambia la ruta, el tamaño o el mtime del fichero origen, o
+    los 'parametros' con que se generó (p. ej. formato de fecha y versión del pivotado).
+    """
+
+    VERSION = 2
+    FICHERO_META = 'meta.json'
+    COLUMNA_INDICE = '__index__'
+
+    def __init__(self, sufijo: str = '.cache'):
+        self.sufijo = sufijo
+
+    def ruta_cache(self, ruta_origen: str) -> str:
+        return os.path.abspath(ruta_origen) + self.sufijo
+
+    def cargar(self, ruta_origen: str, parametros: Optional[Dict] = None) -> Optional[pd.DataFrame]:
+        """Devuelve el DataFrame cacheado (columnas mmap) o None si no hay caché válida."""
+        directorio = self.ruta_cache(ruta_origen)
+        try:
+            with open(os.path.join(directorio, self.FICHERO_META), encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('firma') != self._firma(ruta_origen, parametros):
+                return None
+
+            columnas = {
+                nombre: np.load(os.path.join(directorio, fichero), mmap_mode='c')
+                for nombre, fichero in meta['columnas'].items()
+            }
+        except (OSError, ValueError, KeyError):
+            return None
+
+        indice = pd.Index(columnas.pop(self.COLUMNA_INDICE), copy=False)
+        # copy=False: pandas envuelve los memmaps sin consolidarlos en un bloque nuevo
+        return pd.DataFrame(columnas, index=indice, copy=False)
+
+    def guardar(self, ruta_origen: str, df: pd.DataFrame, parametros: Optional[Dict] = None):
+        """
+        Escribe la caché en un directorio temporal y la publica con un rename atómico.
+        Lanza ValueError si alguna columna no es numérica (np.save sin pickle).
+        """
+        directorio = self.ruta_cache(ruta_origen)
+        temporal = f"{directorio}.tmp-{uuid.uuid4().hex}"
+        os.makedirs(temporal)
+        try:
+            ficheros: Dict[str, str] = {}
+            arrays = {self.COLUMNA_INDICE: df.index.to_numpy()}
+            arrays.update({str(col): df[col].to_numpy() for col in df.columns})
+            for i, (nombre, valores) in enumerate(arrays.items()):
+                fichero = f"col_{i}.npy"
+                np.save(os.path.join(temporal, fichero), np.ascontiguousarray(valores), allow_pickle=False)
+                ficheros[nombre] = fichero
+
+            meta = {'firma': self._firma(ruta_origen, parametros), 'columnas': ficheros}
+            with open(os.path.join(temporal, self.FICHERO_META), 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+
+            # Un rename no puede pisar un directorio con contenido: se aparta el anterior.
+            # Los lectores que ya lo tenían mapeado conservan sus páginas.
+            anterior = None
+            if os.path.isdir(directorio):
+                anterior = f"{directorio}.old-{uuid.uuid4().hex}"
+                os.replace(directorio, anterior)
+            os.replace(temporal, directorio)
+            if anterior:
+                shutil.rmtree(anterior, ignore_errors=True)
+        finally:
+            shutil.rmtree(temporal, ignore_errors=True)
+
+    def _firma(self, ruta_origen: str, parametros: Optional[Dict]) -> Dict:
+        stat = os.stat(ruta_origen)
+        return {
+            'version': self.VERSION,
+            'ruta': os.path.abspath(ruta_origen),
+            'tamano': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'parametros': parametros or {}
+        }
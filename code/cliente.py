@@ -1,5 +1,9 @@
+import logging
 from typing import List
 from interfaces import Suscriber
+from registro import emitir, LOGGER_RAIZ
+
+logger = logging.getLogger(f"{LOGGER_RAIZ}.cliente")
 
 
 class Cliente(Suscriber):
@@ -10,4 +14,4 @@ class Cliente(Suscriber):
         self.temas_suscritos: List[str] = []
 
     def update(self, mensaje: str):
-        print(f"🔔 [NOTIFICACIÓN para {self.email}]: {mensaje}")
+        emitir(logger, logging.INFO, f"🔔 [NOTIFICACIÓN para {self.email}]: {mensaje}")
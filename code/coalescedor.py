@@ -0,0 +1,199 @@
+import logging
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, Iterable, Optional, Tuple
+from interfaces import Suscriber
+from publisher import Publisher
+from incidencias import Incidencia
+from registro import emitir, LOGGER_RAIZ
+
+logger = logging.getLogger(f"{LOGGER_RAIZ}.coalescedor")
+
+
+class CuboTokens:
+    """Token bucket con recarga perezosa (solo se recalcula al consumir)."""
+
+    __slots__ = ('capacidad', 'tasa', 'tokens', 'ultimo')
+
+    def __init__(self, capacidad: float, tasa: float, ahora: float):
+        self.capacidad = capacidad
+        self.tasa = tasa  # tokens por segundo
+        self.tokens = capacidad
+        self.ultimo = ahora
+
+    def consumir(self, ahora: float) -> bool:
+        self.tokens = min(self.capacidad, self.tokens + (ahora - self.ultimo) * self.tasa)
+        self.ultimo = ahora
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+
+class CoalescedorAlertas:
+    """
+    Capa entre la salida de ModuloInteligente y el Publisher para tormentas de alertas:
+    - Deduplica incidencias del mismo tipo (y sensor) dentro de 'ventana_dedup' segundos.
+    - Limita con token buckets por tema y por suscriptor.
+    - Lo suprimido se acumula y se envía como resumen cada 'intervalo_resumen' segundos
+      (con iniciar(), un hilo lo envía aunque no lleguen más incidencias).
+    Así el coste de reparto queda acotado aunque un sensor oscile sin parar.
+    procesar y vaciar se pueden llamar desde hilos distintos.
+    """
+
+    def __init__(self, publisher: Publisher,
+                 ventana_dedup: float = 60.0,
+                 capacidad_tema: float = 20, tasa_tema: float = 1.0,
+                 capacidad_suscriptor: float = 5, tasa_suscriptor: float = 0.2,
+                 intervalo_resumen: float = 300.0,
+                 reloj: Callable[[], float] = time.monotonic):
+        self.publisher = publisher
+        self.ventana_dedup = ventana_dedup
+        self.capacidad_tema = capacidad_tema
+        self.tasa_tema = tasa_tema
+        self.capacidad_suscriptor = capacidad_suscriptor
+        self.tasa_suscriptor = tasa_suscriptor
+        self.intervalo_resumen = intervalo_resumen
+        self.reloj = reloj
+
+        self._vistos: Dict[Tuple, float] = {}  # (tema, código, sensor) -> último envío
+        self._cubos_tema: Dict[str, CuboTokens] = {}
+        # id(suscriptor) -> (suscriptor, cubo): la referencia impide que otro objeto herede
+        # el id; los de quien ya no está suscrito a nada se descartan en vaciar()
+        self._cubos_suscriptor: Dict[int, Tuple[Suscriber, CuboTokens]] = {}
+        # Suprimidas pendientes de resumen: a todo el tema o a un suscriptor concreto
+        self._resumen_tema: Dict[str, Counter] = {}
+        self._resumen_suscriptor: Dict[Tuple[str, int], Tuple[Suscriber, Counter]] = {}
+        self._ultimo_resumen = reloj()
+
+        self._lock = threading.RLock()
+        self._parar = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+
+    # --- Resúmenes periódicos ---
+    def iniciar(self):
+        """Arranca el hilo que llama a vaciar() cada 'intervalo_resumen' segundos (idempotente)."""
+        if self._hilo is not None and self._hilo.is_alive():
+            return
+        self._parar.clear()
+        self._hilo = threading.Thread(target=self._temporizar, name="coalescedor-resumen", daemon=True)
+        self._hilo.start()
+
+    def detener(self, vaciar: bool = True):
+        """Para el hilo de resúmenes y, por defecto, envía lo que quede pendiente."""
+        if self._hilo is not None:
+            self._parar.set()
+            self._hilo.join()
+            self._hilo = None
+        if vaciar:
+            self.vaciar()
+
+    def __enter__(self):
+        self.iniciar()
+        return self
+
+    def __exit__(self, *exc):
+        self.detener()
+
+    def _temporizar(self):
+        while not self._parar.wait(self._espera()):
+            try:
+                self.vaciar()
+            except Exception as e:
+                # Un resumen fallido no debe parar los siguientes
+                emitir(logger, logging.ERROR, f"Error enviando resúmenes: {e}")
+
+    def _espera(self) -> float:
+        # Lo que falta para el próximo resumen (procesar también puede haberlo adelantado)
+        with self._lock:
+            restante = self._ultimo_resumen + self.intervalo_resumen - self.reloj()
+        return min(max(restante, 0.0), self.intervalo_resumen)
+
+    def procesar(self, incidencias: Iterable[Incidencia], tema: str) -> int:
+        """Filtra y reparte las incidencias. Devuelve cuántas se han enviado."""
+        with self._lock:
+            return self._procesar(incidencias, tema)
+
+    def _procesar(self, incidencias: Iterable[Incidencia], tema: str) -> int:
+        ahora = self.reloj()
+        enviadas = 0
+
+        for inc in incidencias:
+            tipo = inc.tipo
+
+            # 1. Deduplicación por ventana temporal
+            clave = (tema, inc.codigo, inc.sensor)
+            ultimo = self._vistos.get(clave)
+            if ultimo is not None and ahora - ultimo < self.ventana_dedup:
+                self._resumen_tema.setdefault(tema, Counter())[tipo] += 1
+                continue
+
+            # 2. Límite global del tema
+            if not self._cubo_tema(tema, ahora).consumir(ahora):
+                self._resumen_tema.setdefault(tema, Counter())[tipo] += 1
+                continue
+            self._vistos[clave] = ahora
+
+            # 3. Límite por suscriptor: solo reciben los que aún tienen tokens
+            permitidos = []
+            for suscriptor in self.publisher.suscriptores(tema):
+                if self._cubo_suscriptor(suscriptor, ahora).consumir(ahora):
+                    permitidos.append(suscriptor)
+                else:
+                    _, conteo = self._resumen_suscriptor.setdefault(
+                        (tema, id(suscriptor)), (suscriptor, Counter()))
+                    conteo[tipo] += 1
+
+            self.publisher.notificar_a(permitidos, self._formatear(inc))
+            enviadas += 1
+
+        if ahora - self._ultimo_resumen >= self.intervalo_resumen:
+            self.vaciar()
+        return enviadas
+
+    def vaciar(self):
+        """
+        Envía ya los resúmenes pendientes y olvida duplicados caducados y los cubos de
+        quien ya no está suscrito a ningún tema.
+        """
+        with self._lock:
+            ahora = self.reloj()
+            periodo = ahora - self._ultimo_resumen
+
+            for tema, conteo in self._resumen_tema.items():
+                self.publisher.notificar(self._formatear_resumen(tema, conteo, periodo), tema)
+            for (tema, _), (suscriptor, conteo) in self._resumen_suscriptor.items():
+                # Quien se ha dado de baja del tema ya no recibe su resumen
+                if self.publisher.esta_suscrito(suscriptor, tema):
+                    self.publisher.notificar_a((suscriptor,), self._formatear_resumen(tema, conteo, periodo))
+
+            self._resumen_tema.clear()
+            self._resumen_suscriptor.clear()
+            self._vistos = {k: t for k, t in self._vistos.items() if ahora - t < self.ventana_dedup}
+            self._cubos_suscriptor = {clave: (suscriptor, cubo)
+                                      for clave, (suscriptor, cubo) in self._cubos_suscriptor.items()
+                                      if self.publisher.esta_suscrito(suscriptor)}
+            self._ultimo_resumen = ahora
+
+    def _cubo_tema(self, tema: str, ahora: float) -> CuboTokens:
+        cubo = self._cubos_tema.get(tema)
+        if cubo is None:
+            cubo = self._cubos_tema[tema] = CuboTokens(self.capacidad_tema, self.tasa_tema, ahora)
+        return cubo
+
+    def _cubo_suscriptor(self, suscriptor: Suscriber, ahora: float) -> CuboTokens:
+        entrada = self._cubos_suscriptor.get(id(suscriptor))
+        if entrada is None:
+            entrada = (suscriptor, CuboTokens(self.capacidad_suscriptor, self.tasa_suscriptor, ahora))
+            self._cubos_suscriptor[id(suscriptor)] = entrada
+        return entrada[1]
+
+    def _formatear(self, inc: Incidencia) -> str:
+        # Único punto donde la incidencia se convierte en texto: solo para las que se envían
+        sensor = f" [{inc.sensor}]" if inc.sensor is not None else ""
+        return f"{inc.tipo}{sensor}: {inc.texto_valor()} ({inc.timestamp})"
+
+    def _formatear_resumen(self, tema: str, conteo: Counter, periodo: float) -> str:
+        detalle = ', '.join(f"{n}x {tipo}" for tipo, n in conteo.most_common())
+        return f"Resumen '{tema}' ({periodo:.0f}s): {detalle} suprimidas"
@@ -1,7 +1,6 @@
 import os
 import sys
 import pandas as pd
-import numpy as np
 # Importamos métricas de sklearn
 from sklearn.metrics import classification_report, confusion_matrix, accuracy_score
 
@@ -13,6 +12,7 @@ sys.path.append(DIR_CODE)
 try:
     from lector_csv import LectorCSV
     from modulo_inteligente import ModuloInteligente
+    from reglas import MotorReglas
 except ImportError:
     sys.exit("❌ No se encuentran los módulos LectorCSV o ModuloInteligente.")
 
@@ -30,21 +30,9 @@ def calcular_ground_truth(df_test):
     v2_diff = df['voltageReceiver2'].diff().abs().fillna(0)
     df['max_v_jump'] = pd.concat([v1_diff, v2_diff], axis=1).max(axis=1)
 
-    # Reglas estrictas (Las mismas que definimos en el módulo)
-    LIMITE_TIEMPO = 120
-    UMBRAL_VOLTAJE = 0.5
-
-    # 0: Normal, 1: Bloqueo, 2: Salto
-    y_true = np.zeros(len(df))
-
-    # Prioridad 1: Bloqueo
-    y_true[df['delta_t'] > LIMITE_TIEMPO] = 1
-
-    # Prioridad 2: Salto (si no es bloqueo)
-    mask_salto = (df['max_v_jump'] >= UMBRAL_VOLTAJE) & (y_true == 0)
-    y_true[mask_salto] = 2
-
-    return y_true
+    # Reglas estrictas (las mismas que usa el módulo): 0 Normal, 1 Bloqueo, 2 Salto.
+    # El bloqueo tiene prioridad sobre el salto
+    return MotorReglas.por_defecto().etiquetar(df)
 
 
 def interpretar_prediccion(alertas):
@@ -56,7 +44,7 @@ def interpretar_prediccion(alertas):
         return 0  # Clase Normal
 
     # Buscamos qué tipo de alerta es
-    tipos = [a['tipo'] for a in alertas]
+    tipos = [a.tipo for a in alertas]
 
     # Damos prioridad al Bloqueo si aparecen ambas (raro)
     if any("BLOQUEO" in t for t in tipos):
@@ -112,7 +100,7 @@ def main():
 
         # (Opcional) Imprimir solo si hay alerta para no saturar consola
         if alertas:
-            pass  # print(f"🚨 Detectado: {alertas[0]['tipo']}")
+            pass  # print(f"🚨 Detectado: {alertas[0].tipo}")
 
     # 5. GENERACIÓN DE REPORTES
     print("\n" + "=" * 50)
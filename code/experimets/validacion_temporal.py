@@ -0,0 +1,251 @@
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+import joblib
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.metrics import accuracy_score, confusion_matrix, f1_score
+from sklearn.model_selection import ParameterGrid
+from typing import Dict, Iterator, List, Set, Tuple
+
+# --- CONFIGURACIÓN DE RUTAS ---
+DIR_EXPERIMENTS = os.path.dirname(os.path.abspath(__file__))
+DIR_CODE = os.path.dirname(DIR_EXPERIMENTS)
+sys.path.append(DIR_CODE)
+sys.path.append(os.path.join(DIR_CODE, "benchmarks"))
+
+try:
+    from lector_csv import LectorCSV
+    from modulo_inteligente import ModuloInteligente
+    from incidencias import BufferIncidencias, TipoIncidencia
+except ImportError:
+    sys.exit("❌ No se encuentran los módulos LectorCSV o ModuloInteligente.")
+
+# Parámetros del módulo (reglas) y del XGBoost que se pueden barrer
+PARAMS_REGLAS = ('UMBRAL_VOLTAJE', 'LIMITE_TIEMPO_SEC')
+
+# Features ya calculadas por proceso del pool (se abren una vez, en modo solo lectura)
+_features_worker: Dict[str, Dict[str, np.ndarray]] = {}
+
+
+def preparar_features(datos: pd.DataFrame, ruta: str, limite_referencia: float,
+                      umbral_referencia: float) -> str:
+    """
+    Calcula las features una sola vez sobre la serie completa y las guarda con joblib
+    para que los workers las abran con mmap (compartidas, sin copiarlas por tarea).
+    Incluye las etiquetas de referencia (reglas físicas estrictas) para puntuar.
+    """
+    if os.path.exists(ruta):
+        print(f"Features reutilizadas de {ruta}")
+        return ruta
+
+    modulo = ModuloInteligente()
+    modulo.LIMITE_TIEMPO_SEC = limite_referencia
+    modulo.UMBRAL_VOLTAJE = umbral_referencia
+    df = modulo._calcular_features_batch(datos)
+    columnas = {col: df[col].fillna(0).to_numpy(dtype=np.float64) for col in modulo.FEATURES}
+    columnas['ts_ns'] = df['timestamp'].to_numpy(dtype='datetime64[ns]').view(np.int64).copy()
+    columnas['y_referencia'] = modulo._etiquetar(df).astype(np.int8)
+
+    temporal = f"{ruta}.tmp"
+    joblib.dump(columnas, temporal)
+    os.replace(temporal, ruta)
+    print(f"Features de {len(df)} filas guardadas en {ruta}")
+    return ruta
+
+
+def pliegues_walk_forward(n: int, n_pliegues: int, fraccion_inicial: float) -> List[Tuple[int, int, int]]:
+    """
+    Rolling-origin con ventana creciente: el pliegue k entrena con [0, corte_k) y
+    evalúa con [corte_k, corte_k + tamaño de bloque). Devuelve (inicio, corte, fin).
+    """
+    inicial = int(n * fraccion_inicial)
+    bloque = (n - inicial) // n_pliegues
+    if inicial == 0 or bloque == 0:
+        raise ValueError("Datos insuficientes para los pliegues pedidos.")
+    return [(0, inicial + k * bloque, inicial + (k + 1) * bloque) for k in range(n_pliegues)]
+
+
+def _cargar_features(ruta: str) -> Dict[str, np.ndarray]:
+    datos = _features_worker.get(ruta)
+    if datos is None:
+        datos = _features_worker[ruta] = joblib.load(ruta, mmap_mode='r')
+    return datos
+
+
+def _clases_predichas(incidencias: BufferIncidencias, ts_test: np.ndarray) -> np.ndarray:
+    """Clase por fila a partir de las alertas, con la misma prioridad que interpretar_prediccion."""
+    y = np.zeros(len(ts_test), dtype=np.int8)
+    filas = np.searchsorted(ts_test, incidencias.ts_ns)
+    codigos = incidencias.codigos
+    saltos = np.isin(codigos, (TipoIncidencia.SALTO_VOLTAJE, TipoIncidencia.POSIBLE_SALTO_IA))
+    y[filas[saltos]] = 2
+    y[filas[~saltos]] = 1  # El bloqueo tiene prioridad sobre el salto
+    return y
+
+
+def evaluar(ruta_features: str, params: Dict, pliegue: Tuple[int, int, int]) -> Dict:
+    """Entrena con el tramo de entrenamiento del pliegue y puntúa el tramo de prueba."""
+    inicio_tarea = time.perf_counter()
+    datos = _cargar_features(ruta_features)
+    inicio, corte, fin = pliegue
+
+    modulo = ModuloInteligente()
+    for nombre in PARAMS_REGLAS:
+        if nombre in params:
+            setattr(modulo, nombre, params[nombre])
+    params_xgb = {k: v for k, v in params.items() if k not in PARAMS_REGLAS}
+    # Un hilo por tarea: el paralelismo lo pone el pool
+    modulo.model.set_params(**params_xgb, n_jobs=1)
+
+    entrenamiento = pd.DataFrame({col: datos[col][inicio:corte] for col in modulo.FEATURES})
+    with contextlib.redirect_stdout(io.StringIO()):
+        modulo._entrenar_features(entrenamiento)
+
+    prueba = slice(corte, fin)
+    ts_test = np.asarray(datos['ts_ns'][prueba])
+    incidencias = modulo._analizar_arrays(
+        ts_test,
+        *(np.asarray(datos[col][prueba]) for col in modulo.FEATURES_BASE)
+    )
+    y_real = np.asarray(datos['y_referencia'][prueba])
+    y_pred = _clases_predichas(incidencias, ts_test)
+
+    return {
+        'accuracy': float(accuracy_score(y_real, y_pred)),
+        'f1_macro': float(f1_score(y_real, y_pred, labels=[0, 1, 2], average='macro', zero_division=0)),
+        'confusion': confusion_matrix(y_real, y_pred, labels=[0, 1, 2]).tolist(),
+        'filas_test': int(fin - corte),
+        'segundos': round(time.perf_counter() - inicio_tarea, 3)
+    }
+
+
+def _clave(params: Dict, indice: int, firma: str) -> str:
+    return json.dumps({'firma': firma, 'params': params, 'pliegue': indice}, sort_keys=True)
+
+
+def _leer_checkpoint(ruta: str) -> Set[str]:
+    """Claves de las tareas ya terminadas (las líneas cortadas por una interrupción se ignoran)."""
+    hechas = set()
+    if os.path.exists(ruta):
+        with open(ruta, encoding='utf-8') as f:
+            for linea in f:
+                try:
+                    hechas.add(json.loads(linea)['clave'])
+                except (json.JSONDecodeError, KeyError):
+                    continue
+    return hechas
+
+
+def ejecutar_barrido(ruta_features: str, rejilla: List[Dict], pliegues: List[Tuple[int, int, int]],
+                     ruta_checkpoint: str, firma: str, n_jobs: int) -> None:
+    """
+    Evalúa en paralelo cada combinación de parámetros en cada pliegue.
+    Cada resultado se añade al checkpoint JSONL en cuanto termina, así que un barrido
+    interrumpido se reanuda con solo las tareas que faltan.
+    """
+    hechas = _leer_checkpoint(ruta_checkpoint)
+    tareas = [(params, i, pliegue) for params in rejilla for i, pliegue in enumerate(pliegues)
+              if _clave(params, i, firma) not in hechas]
+    total = len(rejilla) * len(pliegues)
+    print(f"Tareas: {total} ({total - len(tareas)} ya en el checkpoint, {len(tareas)} pendientes)")
+    if not tareas:
+        return
+
+    resultados: Iterator = Parallel(n_jobs=n_jobs, return_as='generator_unordered')(
+        delayed(_evaluar_tarea)(ruta_features, params, i, pliegue) for params, i, pliegue in tareas)
+
+    with open(ruta_checkpoint, 'a', encoding='utf-8') as f:
+        for n, (params, i, metricas) in enumerate(resultados, 1):
+            registro = {'clave': _clave(params, i, firma), 'firma': firma, 'params': params,
+                        'pliegue': i, **metricas}
+            f.write(json.dumps(registro) + '\n')
+            f.flush()
+            print(f"  [{n}/{len(tareas)}] pliegue {i} {params} -> F1 macro {metricas['f1_macro']:.4f}")
+
+
+def _evaluar_tarea(ruta_features: str, params: Dict, indice: int, pliegue: Tuple[int, int, int]):
+    return params, indice, evaluar(ruta_features, params, pliegue)
+
+
+def resumir(ruta_checkpoint: str, firma: str, top: int) -> pd.DataFrame:
+    """Media y desviación por combinación de parámetros sobre los pliegues terminados."""
+    with open(ruta_checkpoint, encoding='utf-8') as f:
+        registros = [r for r in map(json.loads, f) if r.get('firma') == firma]
+    df = pd.DataFrame(registros)
+    df['params'] = df['params'].map(lambda p: json.dumps(p, sort_keys=True))
+    resumen = (df.groupby('params')
+                 .agg(f1_medio=('f1_macro', 'mean'), f1_std=('f1_macro', 'std'),
+                      accuracy_media=('accuracy', 'mean'), pliegues=('pliegue', 'count'))
+                 .sort_values('f1_medio', ascending=False))
+    print("\n" + "=" * 50)
+    print("       MEJORES COMBINACIONES (walk-forward)")
+    print("=" * 50)
+    print(resumen.head(top).to_string())
+    return resumen
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validación cruzada temporal y búsqueda de parámetros.")
+    parser.add_argument('--datos', default=os.path.join(DIR_EXPERIMENTS, "data", "Dataset-CV.csv"))
+    parser.add_argument('--sintetico', type=int, default=0,
+                        help="Usa N lecturas sintéticas en lugar del CSV")
+    parser.add_argument('--pliegues', type=int, default=5)
+    parser.add_argument('--fraccion-inicial', type=float, default=0.5,
+                        help="Parte de la serie usada como entrenamiento mínimo del primer pliegue")
+    parser.add_argument('--umbrales', type=float, nargs='+', default=[0.5])
+    parser.add_argument('--limites', type=float, nargs='+', default=[120])
+    parser.add_argument('--max-depth', type=int, nargs='+', default=[6])
+    parser.add_argument('--n-estimators', type=int, nargs='+', default=[100])
+    parser.add_argument('--learning-rate', type=float, nargs='+', default=[0.3])
+    parser.add_argument('--limite-referencia', type=float, default=120)
+    parser.add_argument('--umbral-referencia', type=float, default=0.5)
+    parser.add_argument('--n-jobs', type=int, default=-1)
+    parser.add_argument('--salida', default=os.path.join(DIR_EXPERIMENTS, "resultados_cv"))
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    # 1. LECTURA
+    if args.sintetico:
+        from generador_sintetico import generar_lecturas
+        datos = generar_lecturas(args.sintetico)
+        origen = f"sintetico:{args.sintetico}"
+    else:
+        datos = LectorCSV().leer(args.datos)
+        origen = f"{os.path.abspath(args.datos)}:{os.path.getmtime(args.datos)}"
+    if datos.empty:
+        sys.exit("❌ No hay datos que evaluar.")
+
+    # 2. FEATURES (una vez) Y PLIEGUES
+    os.makedirs(args.salida, exist_ok=True)
+    firma = hashlib.sha1(f"{origen}|{len(datos)}|{args.pliegues}|{args.fraccion_inicial}|"
+                         f"{args.limite_referencia}|{args.umbral_referencia}".encode()).hexdigest()[:12]
+    ruta_features = preparar_features(datos, os.path.join(args.salida, f"features_{firma}.joblib"),
+                                      args.limite_referencia, args.umbral_referencia)
+    pliegues = pliegues_walk_forward(len(datos), args.pliegues, args.fraccion_inicial)
+    del datos
+
+    # 3. BARRIDO
+    rejilla = list(ParameterGrid({
+        'UMBRAL_VOLTAJE': args.umbrales,
+        'LIMITE_TIEMPO_SEC': args.limites,
+        'max_depth': args.max_depth,
+        'n_estimators': args.n_estimators,
+        'learning_rate': args.learning_rate
+    }))
+    ruta_checkpoint = os.path.join(args.salida, "checkpoint.jsonl")
+    print(f"--- BARRIDO: {len(rejilla)} combinaciones x {len(pliegues)} pliegues ---")
+    ejecutar_barrido(ruta_features, rejilla, pliegues, ruta_checkpoint, firma, args.n_jobs)
+
+    # 4. REPORTE
+    resumir(ruta_checkpoint, firma, args.top)
+
+
+if __name__ == "__main__":
+    main()
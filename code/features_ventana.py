@@ -0,0 +1,339 @@
+import math
+import numpy as np
+import pandas as pd
+from collections import deque
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Sequence, Tuple
+
+ESTADISTICOS = ('media', 'std', 'min', 'max')
+
+
+@dataclass(frozen=True)
+class ConfigVentanas:
+    """
+    Features de ventana deslizante sobre las columnas de tensión:
+    media/std/min/max en las últimas N lecturas ('lecturas') o en los últimos
+    T segundos ('segundos'), EWMA por cada alpha y segundos desde el último
+    cambio de 'status'.
+    """
+    lecturas: Tuple[int, ...] = ()
+    segundos: Tuple[float, ...] = ()
+    alphas_ewm: Tuple[float, ...] = ()
+    tiempo_desde_cambio_status: bool = False
+    columnas: Tuple[str, ...] = ('voltageReceiver1', 'voltageReceiver2')
+
+    def nombres(self) -> List[str]:
+        """Nombres de las features en el orden en que se calculan (batch y streaming)."""
+        nombres = []
+        for col in self.columnas:
+            for n in self.lecturas:
+                nombres += [f"{col}_{est}_{n}l" for est in ESTADISTICOS]
+            for t in self.segundos:
+                nombres += [f"{col}_{est}_{t:g}s" for est in ESTADISTICOS]
+            nombres += [f"{col}_ewm_{a:g}" for a in self.alphas_ewm]
+        if self.tiempo_desde_cambio_status:
+            nombres.append('t_desde_cambio_status')
+        return nombres
+
+    def a_dict(self) -> Dict:
+        return asdict(self)
+
+    @classmethod
+    def desde_dict(cls, datos: Dict) -> 'ConfigVentanas':
+        return cls(**{k: tuple(v) if isinstance(v, list) else v for k, v in datos.items()})
+
+
+def _alpha_pandas(alpha: float) -> float:
+    # pandas pasa alpha a centro de masa y lo recalcula: se reproduce para obtener los mismos bits
+    return 1.0 / (1.0 + (1 - alpha) / alpha)
+
+
+def _a_ns(segundos: float) -> int:
+    return int(round(segundos * 1e9))
+
+
+# --- MODO BATCH (vectorizado) ---
+
+def calcular_ventanas(df: pd.DataFrame, config: ConfigVentanas) -> pd.DataFrame:
+    """
+    Calcula todas las features de ventana de un DataFrame ordenado por 'timestamp'.
+    Es un único bloque de CalculadorVentanas partiendo de cero: media y std salen de
+    sumas acumuladas, min/max de los rolling de pandas y la EWMA de
+    ewm(adjust=False, ignore_na=True), con los mismos resultados que lectura a lectura.
+    """
+    ts_ns = df['timestamp'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+    valores = df[list(config.columnas)].to_numpy(dtype=np.float64)
+    if 'status' in df.columns:
+        status = df['status'].to_numpy(dtype=np.float64)
+    else:
+        status = np.zeros(len(df))
+    salida = CalculadorVentanas(config).actualizar_bloque(ts_ns, valores, status)
+    return pd.DataFrame(salida, columns=config.nombres(), index=df.index)
+
+
+def _media_std(p1, p2, pn, inicio, fin, ref) -> Tuple[np.ndarray, np.ndarray]:
+    s1 = p1[fin] - p1[inicio]
+    s2 = p2[fin] - p2[inicio]
+    n = pn[fin] - pn[inicio]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        media = np.where(n > 0, s1 / n + ref, np.nan)
+        var = np.where(n > 1, (s2 - s1 * s1 / n) / (n - 1), np.nan)
+    return media, np.sqrt(np.maximum(var, 0.0))
+
+
+# --- MODO STREAMING (incremental, O(1) por lectura) ---
+
+class _Extremos:
+    """Min y max deslizantes con colas monótonas (O(1) amortizado)."""
+
+    __slots__ = ('minimos', 'maximos')
+
+    def __init__(self):
+        self.minimos = deque()  # (posición, valor) con valores crecientes
+        self.maximos = deque()  # (posición, valor) con valores decrecientes
+
+    def actualizar(self, posicion, x: float, limite) -> Tuple[float, float]:
+        """Añade x (si es válido) y descarta lo que tenga posición <= limite."""
+        if x == x:
+            while self.minimos and self.minimos[-1][1] >= x:
+                self.minimos.pop()
+            self.minimos.append((posicion, x))
+            while self.maximos and self.maximos[-1][1] <= x:
+                self.maximos.pop()
+            self.maximos.append((posicion, x))
+        while self.minimos and self.minimos[0][0] <= limite:
+            self.minimos.popleft()
+        while self.maximos and self.maximos[0][0] <= limite:
+            self.maximos.popleft()
+        return (self.minimos[0][1] if self.minimos else math.nan,
+                self.maximos[0][1] if self.maximos else math.nan)
+
+
+class _EstadoColumna:
+    """Sumas acumuladas, ring buffers de prefijos y EWMA de una columna."""
+
+    def __init__(self, config: ConfigVentanas):
+        self.ref = None
+        self.p1 = 0.0
+        self.p2 = 0.0
+        self.pn = 0
+        # Prefijos previos a cada lectura: por nº de lecturas (maxlen fija) o por tiempo
+        self.prefijos_n = [deque(maxlen=n) for n in config.lecturas]
+        self.prefijos_t = [deque() for _ in config.segundos]
+        self.extremos_n = [_Extremos() for _ in config.lecturas]
+        self.extremos_t = [_Extremos() for _ in config.segundos]
+        # Último valor de cada EWMA
+        self.ewm = [math.nan for _ in config.alphas_ewm]
+
+
+class CalculadorVentanas:
+    """Versión incremental de calcular_ventanas: mismos resultados, lectura a lectura."""
+
+    def __init__(self, config: ConfigVentanas):
+        self.config = config
+        self._ventanas_ns = [_a_ns(t) for t in config.segundos]
+        self._alphas = [_alpha_pandas(a) for a in config.alphas_ewm]
+        self.reiniciar()
+
+    def reiniciar(self):
+        self._posicion = 0
+        self._columnas = [_EstadoColumna(self.config) for _ in self.config.columnas]
+        self._status_previo = None
+        self._ts_cambio = 0
+
+    def actualizar(self, ts_ns: int, valores: Sequence[float], status: float) -> List[float]:
+        """Incorpora una lectura (valores en el orden de config.columnas) y devuelve sus features."""
+        salida = []
+        i = self._posicion
+        self._posicion += 1
+
+        for estado, x in zip(self._columnas, valores):
+            valido = x == x
+            if valido and estado.ref is None:
+                estado.ref = x
+            ref = estado.ref if estado.ref is not None else 0.0
+            previo = (estado.p1, estado.p2, estado.pn)
+            if valido:
+                v = x - ref
+                estado.p1 = estado.p1 + v
+                estado.p2 = estado.p2 + v * v
+                estado.pn += 1
+
+            for prefijos, extremos, n in zip(estado.prefijos_n, estado.extremos_n, self.config.lecturas):
+                prefijos.append(previo)
+                salida += self._media_std(estado, prefijos[0], ref)
+                salida += extremos.actualizar(i, x, i - n)
+
+            for prefijos, extremos, ventana in zip(estado.prefijos_t, estado.extremos_t, self._ventanas_ns):
+                prefijos.append((ts_ns, previo))
+                limite = ts_ns - ventana
+                while prefijos[0][0] <= limite:
+                    prefijos.popleft()
+                salida += self._media_std(estado, prefijos[0][1], ref)
+                salida += extremos.actualizar(ts_ns, x, limite)
+
+            for k, alpha in enumerate(self._alphas):
+                ponderado = estado.ewm[k]
+                if ponderado != ponderado:
+                    ponderado = x
+                elif valido and ponderado != x:
+                    # Mismas operaciones que pandas ewm(adjust=False, ignore_na=True)
+                    ponderado = ((1.0 - alpha) * ponderado + alpha * x) / ((1.0 - alpha) + alpha)
+                estado.ewm[k] = ponderado
+                salida.append(ponderado)
+
+        if self.config.tiempo_desde_cambio_status:
+            if self._status_previo is None or status != self._status_previo:
+                self._ts_cambio = ts_ns
+            self._status_previo = status
+            salida.append((ts_ns - self._ts_cambio) / 1e9)
+
+        return salida
+
+    def actualizar_bloque(self, ts_ns: np.ndarray, valores: np.ndarray, status: np.ndarray) -> np.ndarray:
+        """
+        Equivale a llamar a actualizar con cada fila de un bloque (valores con una columna
+        por config.columnas), pero vectorizado: el bloque arranca de los prefijos, extremos
+        y EWMA guardados y al terminar deja el estado como si se hubiera recorrido fila a
+        fila, así que ambos modos se pueden alternar.
+        """
+        ts_ns = np.asarray(ts_ns, dtype=np.int64)
+        m = len(ts_ns)
+        if m == 0:
+            return np.empty((0, len(self.config.nombres())))
+        valores = np.asarray(valores, dtype=np.float64).reshape(m, -1)
+        posiciones = self._posicion + np.arange(m)
+        self._posicion += m
+
+        salida = []
+        for estado, x in zip(self._columnas, valores.T):
+            salida += self._bloque_columna(estado, ts_ns, posiciones, x)
+        if self.config.tiempo_desde_cambio_status:
+            salida.append(self._bloque_status(ts_ns, np.asarray(status, dtype=np.float64)))
+        return np.column_stack(salida)
+
+    def _bloque_columna(self, estado: _EstadoColumna, ts_ns: np.ndarray, posiciones: np.ndarray,
+                        x: np.ndarray) -> List[np.ndarray]:
+        m = len(x)
+        valido = ~np.isnan(x)
+        if estado.ref is None and valido.any():
+            estado.ref = float(x[valido][0])
+        ref = estado.ref if estado.ref is not None else 0.0
+
+        # 1. Prefijos antes de cada fila y tras la última, continuando los guardados
+        # (cumsum suma en el mismo orden que actualizar, así que los bits coinciden)
+        v = np.where(valido, x - ref, 0.0)
+        p1 = np.cumsum(np.r_[estado.p1, v])
+        p2 = np.cumsum(np.r_[estado.p2, v * v])
+        pn = np.cumsum(np.r_[estado.pn, valido.astype(np.int64)])
+        estado.p1, estado.p2, estado.pn = float(p1[-1]), float(p2[-1]), int(pn[-1])
+
+        salida = []
+        for prefijos, extremos, n in zip(estado.prefijos_n, estado.extremos_n, self.config.lecturas):
+            # Prefijos de las filas anteriores que aún caben en la ventana, delante de los del bloque
+            q1, q2, qn, previos = _con_prefijos(prefijos, p1, p2, pn)
+            fin = previos + 1 + np.arange(m)
+            inicio = np.maximum(fin - n, 0)
+            salida += _media_std(q1, q2, qn, inicio, fin, ref)
+            salida += _extremos_bloque(extremos, posiciones, x, valido, posiciones - n,
+                                       pd.Series(x).rolling(n, min_periods=1))
+            prefijos.clear()
+            prefijos.extend(zip(q1[-n - 1:-1].tolist(), q2[-n - 1:-1].tolist(), qn[-n - 1:-1].tolist()))
+
+        for prefijos, extremos, ventana in zip(estado.prefijos_t, estado.extremos_t, self._ventanas_ns):
+            instantes = [t for t, _ in prefijos]
+            q1, q2, qn, previos = _con_prefijos([p for _, p in prefijos], p1, p2, pn)
+            ts_q = np.r_[np.array(instantes, dtype=np.int64), ts_ns]
+            limites = ts_ns - ventana
+            inicio = np.searchsorted(ts_q, limites, side='right')
+            salida += _media_std(q1, q2, qn, inicio, previos + 1 + np.arange(m), ref)
+            rolling = pd.Series(x, index=pd.DatetimeIndex(ts_ns)).rolling(pd.Timedelta(ventana, unit='ns'),
+                                                                        min_periods=1)
+            salida += _extremos_bloque(extremos, ts_ns, x, valido, limites, rolling)
+            corte = inicio[-1]
+            prefijos.clear()
+            prefijos.extend(zip(ts_q[corte:].tolist(),
+                                zip(q1[corte:-1].tolist(), q2[corte:-1].tolist(), qn[corte:-1].tolist())))
+
+        for k, a in enumerate(self.config.alphas_ewm):
+            # El último valor de la EWMA hace de primera observación: misma recurrencia que actualizar
+            ewm = pd.Series(np.r_[estado.ewm[k], x]).ewm(alpha=a, adjust=False, ignore_na=True).mean()
+            ewm = ewm.to_numpy()[1:]
+            estado.ewm[k] = float(ewm[-1])
+            salida.append(ewm)
+        return salida
+
+    def _bloque_status(self, ts_ns: np.ndarray, status: np.ndarray) -> np.ndarray:
+        m = len(status)
+        cambio = np.empty(m, dtype=bool)
+        cambio[0] = self._status_previo is None or status[0] != self._status_previo
+        cambio[1:] = status[1:] != status[:-1]
+        # Último cambio propagado hacia delante; antes del primero del bloque, el guardado
+        ultimo = np.maximum.accumulate(np.where(cambio, np.arange(m), -1))
+        ts_cambio = np.where(ultimo >= 0, ts_ns[np.maximum(ultimo, 0)], self._ts_cambio)
+        self._status_previo = float(status[-1])
+        self._ts_cambio = int(ts_cambio[-1])
+        return (ts_ns - ts_cambio) / 1e9
+
+    @staticmethod
+    def _media_std(estado: _EstadoColumna, inicio: Tuple, ref: float) -> List[float]:
+        s1 = estado.p1 - inicio[0]
+        s2 = estado.p2 - inicio[1]
+        n = estado.pn - inicio[2]
+        media = s1 / n + ref if n > 0 else math.nan
+        if n > 1:
+            std = math.sqrt(max((s2 - s1 * s1 / n) / (n - 1), 0.0))
+        else:
+            std = math.nan
+        return [media, std]
+
+
+def _con_prefijos(previos, p1: np.ndarray, p2: np.ndarray, pn: np.ndarray):
+    """Antepone a los prefijos del bloque los guardados (p1, p2, pn) de las filas anteriores."""
+    if not previos:
+        return p1, p2, pn, 0
+    a1, a2, an = zip(*previos)
+    return np.r_[a1, p1], np.r_[a2, p2], np.r_[np.array(an, dtype=np.int64), pn], len(previos)
+
+
+def _extremos_bloque(extremos: _Extremos, posiciones: np.ndarray, x: np.ndarray, valido: np.ndarray,
+                     limites: np.ndarray, rolling) -> List[np.ndarray]:
+    """
+    Min y max de cada fila: los del propio bloque (rolling de pandas) combinados con los
+    candidatos de las filas anteriores que siguen en la ventana (posición > límite).
+    Deja en 'extremos' las colas monótonas que habría tras la última fila.
+    """
+    salida = []
+    for cola, resultado, combinar, mayor in ((extremos.minimos, rolling.min().to_numpy(), np.fmin, False),
+                                             (extremos.maximos, rolling.max().to_numpy(), np.fmax, True)):
+        pos_previas = np.array([p for p, _ in cola], dtype=np.int64)
+        val_previos = np.array([v for _, v in cola], dtype=np.float64)
+        if len(cola):
+            # Las colas están ordenadas por posición y valor: el primer candidato vigente es el extremo
+            k = np.searchsorted(pos_previas, limites, side='right')
+            previo = np.r_[val_previos, np.nan][k]
+            resultado = combinar(resultado, previo)
+        salida.append(resultado)
+
+        # Candidatos que siguen en la ventana de la última fila: los previos y los del bloque
+        limite = limites[-1]
+        desde = np.searchsorted(posiciones, limite, side='right')
+        quedan = pos_previas > limite
+        pos = np.r_[pos_previas[quedan], posiciones[desde:][valido[desde:]]]
+        val = np.r_[val_previos[quedan], x[desde:][valido[desde:]]]
+        cola.clear()
+        cola.extend(_cadena_monotona(pos, val, mayor))
+    return salida
+
+
+def _cadena_monotona(pos: np.ndarray, val: np.ndarray, mayor: bool):
+    """Lo que conserva la cola de _Extremos: cada valor estrictamente menor (o mayor) que todos los posteriores."""
+    if len(val) == 0:
+        return []
+    if mayor:
+        posteriores = np.r_[np.maximum.accumulate(val[::-1])[::-1][1:], -np.inf]
+        conservar = val > posteriores
+    else:
+        posteriores = np.r_[np.minimum.accumulate(val[::-1])[::-1][1:], np.inf]
+        conservar = val < posteriores
+    return zip(pos[conservar].tolist(), val[conservar].tolist())
@@ -0,0 +1,194 @@
+import numpy as np
+from enum import IntEnum
+from typing import TYPE_CHECKING, Any, Dict, Hashable, Iterable, Iterator, List, NamedTuple, Optional, Sequence
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+class TipoIncidencia(IntEnum):
+    BLOQUEO_DATOS = 0
+    SALTO_VOLTAJE = 1
+    POSIBLE_BLOQUEO_IA = 2
+    POSIBLE_SALTO_IA = 3
+
+    @property
+    def etiqueta(self) -> str:
+        return ETIQUETAS[self]
+
+
+# Texto que ven los usuarios (el mismo que se usaba en las alertas)
+ETIQUETAS = ("BLOQUEO_DATOS", "SALTO_VOLTAJE", "POSIBLE_BLOQUEO (IA)", "POSIBLE_SALTO (IA)")
+_TIPOS = tuple(TipoIncidencia)
+
+
+class Incidencia(NamedTuple):
+    """
+    Registro compacto de una incidencia. 'valor' son los segundos desde la lectura
+    anterior (bloqueos) o los voltios del salto (saltos); el texto se genera solo al notificar.
+    """
+    codigo: TipoIncidencia
+    valor: float
+    ts_ns: int
+    sensor: Any = None
+
+    @property
+    def tipo(self) -> str:
+        return ETIQUETAS[self.codigo]
+
+    @property
+    def timestamp(self) -> 'pd.Timestamp':
+        import pandas as pd
+        return pd.Timestamp(self.ts_ns)
+
+    def texto_valor(self) -> str:
+        if self.codigo == TipoIncidencia.BLOQUEO_DATOS:
+            return f"{self.valor}s"
+        if self.codigo == TipoIncidencia.SALTO_VOLTAJE:
+            return f"{self.valor:.2f}V"
+        return "Predicción"
+
+
+class BufferIncidencias:
+    """
+    Buffer columnar de solo inserción (arrays NumPy que crecen al doble).
+    Los sensores se guardan codificados como índice en una tabla de valores distintos.
+    Iterarlo produce Incidencia; a_dataframe() no crea objetos por incidencia.
+    """
+
+    def __init__(self, capacidad: int = 1024):
+        capacidad = max(capacidad, 1)
+        self._codigo = np.empty(capacidad, dtype=np.int8)
+        self._valor = np.empty(capacidad, dtype=np.float64)
+        self._ts_ns = np.empty(capacidad, dtype=np.int64)
+        self._sensor = np.empty(capacidad, dtype=np.int32)  # -1: sin sensor
+        self._n = 0
+        self._sensores: List[Hashable] = []
+        self._indice_sensor: Dict[Hashable, int] = {}
+
+    # --- Columnas (vistas, sin copia) ---
+    @property
+    def codigos(self) -> np.ndarray:
+        return self._codigo[:self._n]
+
+    @property
+    def valores(self) -> np.ndarray:
+        return self._valor[:self._n]
+
+    @property
+    def ts_ns(self) -> np.ndarray:
+        return self._ts_ns[:self._n]
+
+    def sensores(self) -> Optional[np.ndarray]:
+        """Sensores decodificados (array de objetos) o None si ninguna incidencia lo lleva."""
+        if not self._sensores:
+            return None
+        tabla = np.array(self._sensores + [None], dtype=object)
+        return tabla[self._sensor[:self._n]]  # el índice -1 cae en el None final
+
+    # --- Inserción ---
+    def agregar(self, codigo: int, valor: float, ts_ns: int, sensor: Hashable = None):
+        self._reservar(1)
+        i = self._n
+        self._codigo[i] = codigo
+        self._valor[i] = valor
+        self._ts_ns[i] = ts_ns
+        self._sensor[i] = -1 if sensor is None else self._codificar(sensor)
+        self._n += 1
+
+    def extender(self, codigos: np.ndarray, valores: np.ndarray, ts_ns: np.ndarray,
+                 sensores: Optional[Sequence] = None):
+        n = len(codigos)
+        if n == 0:
+            return
+        self._reservar(n)
+        bloque = slice(self._n, self._n + n)
+        self._codigo[bloque] = codigos
+        self._valor[bloque] = valores
+        self._ts_ns[bloque] = ts_ns
+        if sensores is None:
+            self._sensor[bloque] = -1
+        else:
+            import pandas as pd
+            # Solo se recorren en Python los sensores distintos
+            codigos_locales, unicos = pd.factorize(np.asarray(sensores, dtype=object))
+            mapa = np.array([self._codificar(s) for s in unicos] + [-1], dtype=np.int32)
+            self._sensor[bloque] = mapa[codigos_locales]
+        self._n += n
+
+    def extender_desde(self, otro: 'BufferIncidencias'):
+        self.extender(otro.codigos, otro.valores, otro.ts_ns, otro.sensores())
+
+    @classmethod
+    def concatenar(cls, buffers: Iterable['BufferIncidencias']) -> 'BufferIncidencias':
+        buffers = list(buffers)
+        resultado = cls(sum(len(b) for b in buffers))
+        for buffer in buffers:
+            resultado.extender_desde(buffer)
+        return resultado
+
+    def ordenar_por_tiempo(self) -> 'BufferIncidencias':
+        """Copia ordenada por timestamp (estable: a igual instante se mantiene el orden)."""
+        return self.reordenar(np.argsort(self.ts_ns, kind='stable'))
+
+    def reordenar(self, orden: np.ndarray) -> 'BufferIncidencias':
+        """Copia con las incidencias en las posiciones indicadas por 'orden'."""
+        sensores = self.sensores()
+        resultado = BufferIncidencias(self._n)
+        resultado.extender(self.codigos[orden], self.valores[orden], self.ts_ns[orden],
+                           None if sensores is None else sensores[orden])
+        return resultado
+
+    def limpiar(self):
+        self._n = 0
+
+    # --- Acceso ---
+    def __len__(self) -> int:
+        return self._n
+
+    def __getitem__(self, i: int) -> Incidencia:
+        if i < 0:
+            i += self._n
+        if not 0 <= i < self._n:
+            raise IndexError(i)
+        s = self._sensor[i]
+        return Incidencia(_TIPOS[self._codigo[i]], float(self._valor[i]), int(self._ts_ns[i]),
+                          None if s < 0 else self._sensores[s])
+
+    def __iter__(self) -> Iterator[Incidencia]:
+        sensores = self.sensores()
+        if sensores is None:
+            sensores = [None] * self._n
+        for codigo, valor, ts, sensor in zip(self.codigos.tolist(), self.valores.tolist(),
+                                             self.ts_ns.tolist(), sensores):
+            yield Incidencia(_TIPOS[codigo], valor, ts, sensor)
+
+    def a_dataframe(self) -> 'pd.DataFrame':
+        import pandas as pd
+        columnas = {
+            'tipo': pd.Categorical.from_codes(self.codigos, categories=ETIQUETAS),
+            'valor': self.valores.copy(),
+            'timestamp': self.ts_ns.view('datetime64[ns]').copy(),
+        }
+        sensores = self.sensores()
+        if sensores is not None:
+            columnas['sensor'] = sensores
+        return pd.DataFrame(columnas)
+
+    def _codificar(self, sensor: Hashable) -> int:
+        indice = self._indice_sensor.get(sensor)
+        if indice is None:
+            indice = self._indice_sensor[sensor] = len(self._sensores)
+            self._sensores.append(sensor)
+        return indice
+
+    def _reservar(self, n: int):
+        necesario = self._n + n
+        if necesario <= len(self._codigo):
+            return
+        capacidad = max(necesario, 2 * len(self._codigo))
+        for nombre in ('_codigo', '_valor', '_ts_ns', '_sensor'):
+            viejo = getattr(self, nombre)
+            nuevo = np.empty(capacidad, dtype=viejo.dtype)
+            nuevo[:self._n] = viejo[:self._n]
+            setattr(self, nombre, nuevo)
@@ -7,3 +7,11 @@ class Suscriber(ABC):
     @abstractmethod
     def update(self, mensaje: str):
         pass
+
+
+class Exportador(ABC):
+    """Interfaz abstracta para los exportadores de métricas."""
+
+    @abstractmethod
+    def exportar(self, instantanea: dict):
+        pass
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Optional, Tuple
+from features_ventana import CalculadorVentanas
+from metricas import memoria_rss_mb
+
+if TYPE_CHECKING:
+    from modulo_inteligente import ModuloInteligente
+
+
+class IteradorEntrenamiento(xgb.DataIter):
+    """
+    Entrega a XGBoost los bloques de 'fuente' como (features float32, etiquetas).
+    Cada pasada vuelve a leer la fuente y enlaza los bloques entre sí igual que
+    analizar_todo(continuar=True). Las clases vistas en la primera pasada deciden
+    el bloque final de casos sintéticos, que se repite idéntico en las siguientes.
+    Un bloque con attrs['nueva_serie'] (p. ej. el primero de cada sensor en
+    AlmacenHistorico.leer_stream) no se enlaza con el anterior.
+    """
+
+    def __init__(self, modulo: 'ModuloInteligente', fuente: Callable[[], Iterable[pd.DataFrame]],
+                 abortar_si_rss_mb: Optional[float] = None, ruta_cache: Optional[str] = None):
+        super().__init__(cache_prefix=ruta_cache)
+        self.modulo = modulo
+        self.fuente = fuente
+        self.abortar_si_rss_mb = abortar_si_rss_mb
+        self.filas = 0
+        self.bloques = 0
+        self._clases = set()
+        self._sinteticos: Optional[Tuple[pd.DataFrame, np.ndarray]] = None
+        self._preparar_pasada()
+
+    def _preparar_pasada(self):
+        self._bloques = None
+        self._previo: Optional[Dict] = None
+        self._calculador = CalculadorVentanas(self.modulo.ventanas)
+        self._sintetico_entregado = False
+
+    def reset(self):
+        self._preparar_pasada()
+
+    def next(self, input_data: Callable) -> bool:
+        # Primera pasada: aún no se ha decidido el bloque sintético
+        primera_pasada = self._sinteticos is None
+        if self._bloques is None:
+            self._bloques = iter(self.fuente())
+
+        for bloque in self._bloques:
+            if bloque.empty:
+                continue
+            if bloque.attrs.get('nueva_serie'):
+                self._previo = None
+            df = self.modulo._calcular_features_batch(bloque, ventanas=False)
+            self._previo = self.modulo._enlazar_bloque(df, self._previo, self._calculador)
+            y = self.modulo._etiquetar(df)
+            X = df[self.modulo.FEATURES].fillna(0).to_numpy(dtype=np.float32)
+            del df
+            if primera_pasada:
+                self._clases.update(np.unique(y).tolist())
+                self.filas += len(y)
+                self.bloques += 1
+            input_data(data=X, label=y, feature_names=self.modulo.FEATURES)
+            self.comprobar_memoria()
+            return True
+
+        # Bloque final con los casos sintéticos de las clases ausentes
+        if not self._sintetico_entregado:
+            self._sintetico_entregado = True
+            if primera_pasada:
+                self._sinteticos = self.modulo._filas_sinteticas(np.array(sorted(self._clases)))
+            X, y = self._sinteticos
+            if len(y):
+                input_data(data=X.to_numpy(dtype=np.float32), label=y, feature_names=self.modulo.FEATURES)
+                return True
+        return False
+
+    def comprobar_memoria(self):
+        """Guarda a posteriori: se llama con el bloque ya materializado y entregado."""
+        if self.abortar_si_rss_mb is not None:
+            rss = memoria_rss_mb()
+            if rss > self.abortar_si_rss_mb:
+                raise MemoryError(f"RSS de {rss:.0f} MB por encima del límite de {self.abortar_si_rss_mb:.0f} MB: "
+                                  "reduce el tamaño de bloque o usa ruta_cache (memoria externa).")
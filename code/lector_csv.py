@@ -1,46 +1,134 @@
 import pandas as pd
 from io import StringIO
+from typing import Iterator, Optional
+from parser_tiempo import ParserTiempo
+from cache_columnar import CacheColumnar
+from memoria_compartida import SegmentoCompartido
 
 
 class LectorCSV:
+    # Cambia si lo hace el resultado de _pivotar (columnas, unidades): invalida las cachés
+    VERSION_PIVOTADO = 1
+
+    def __init__(self, parser_tiempo: Optional[ParserTiempo] = None,
+                 cache: Optional[CacheColumnar] = None, usar_cache: bool = True):
+        # El formato de fecha se detecta una vez y se reutiliza en cada lectura/bloque
+        self.parser_tiempo = parser_tiempo or ParserTiempo()
+        # Caché binaria junto al CSV: las lecturas repetidas no vuelven a parsear
+        self.cache = (cache or CacheColumnar()) if usar_cache else None
+
     def leer(self, ruta_archivo: str) -> pd.DataFrame:
         """
         Transforma el CSV crudo (filas mixtas) en un DataFrame estructurado.
         Responsabilidad: IO y Limpieza de datos (No validación de reglas).
         """
         try:
+            # 0. Caché columnar (si el CSV no ha cambiado desde la última lectura)
+            if self.cache is not None:
+                df_cache = self.cache.cargar(ruta_archivo, self._parametros_cache())
+                if df_cache is not None:
+                    return df_cache
+
             # 1. Cargar datos brutos
             # sep=';' según tu ejemplo de datos
             df = pd.read_csv(ruta_archivo, sep=';')
 
             # 2. Conversión de Tipos Básica
-            # Convertir fecha a objeto datetime real
-            df['tiempo'] = pd.to_datetime(df['tiempo'], dayfirst=True)
-
-            # 3. Pivotar (Transformación Estructural)
-            # Pasamos de tener medidas en filas a tener columnas:
-            # [timestamp, voltageReceiver1, voltageReceiver2, status]
-            df_pivot = df.pivot_table(
-                index='tiempo',
-                columns='medida',
-                values='valor',
-                aggfunc='mean'  # Por si hay duplicados en el mismo milisegundo
-            ).reset_index()
-
-            # Limpieza de nombres de columnas
-            df_pivot.columns.name = None
-            df_pivot = df_pivot.rename(columns={'tiempo': 'timestamp'})
-
-            # 4. Normalización de Unidades (Estandarización)
-            # Convertir mV a V para que el sistema trabaje en Voltios
-            cols_voltaje = ['voltageReceiver1', 'voltageReceiver2']
-            for col in cols_voltaje:
-                if col in df_pivot.columns:
-                    df_pivot[col] = df_pivot[col] / 1000.0
-
-            # Ordenar cronológicamente es vital para las diferencias de tiempo
-            return df_pivot.sort_values('timestamp')
+            # Convertir fecha a objeto datetime real (formato detectado y cacheado)
+            df['tiempo'] = self.parser_tiempo.parsear_columna(df['tiempo'])
+
+            df_pivot = self._pivotar(df)
 
         except Exception as e:
             print(f"Error leyendo el archivo CSV: {e}")
-            return pd.DataFrame()  # Retorno vacío en caso de fallo
\ No newline at end of file
+            return pd.DataFrame()  # Retorno vacío en caso de fallo
+
+        if self.cache is not None:
+            try:
+                self.cache.guardar(ruta_archivo, df_pivot, self._parametros_cache())
+            except (OSError, ValueError) as e:
+                # Sin permisos junto al CSV o columnas no numéricas: se sigue sin caché
+                print(f"Aviso: no se pudo guardar la caché columnar: {e}")
+        return df_pivot
+
+    def _parametros_cache(self) -> dict:
+        """Lo que, además del fichero, determina el DataFrame resultante."""
+        return {'formato_tiempo': self.parser_tiempo.formato_configurado,
+                'pivotado': self.VERSION_PIVOTADO}
+
+    def leer_compartido(self, ruta_archivo: str) -> Optional[SegmentoCompartido]:
+        """
+        leer() + publicación de las columnas pivotadas en memoria compartida, para que
+        los procesos de detección las lean sin pickle (ver MotorDeteccion.analizar_compartido).
+        Devuelve None si no hay datos; el llamador cierra el segmento al terminar.
+        """
+        df = self.leer(ruta_archivo)
+        if df.empty:
+            return None
+        return SegmentoCompartido.desde_dataframe(df)
+
+    def leer_stream(self, ruta_archivo: str, chunksize: int = 500_000) -> Iterator[pd.DataFrame]:
+        """
+        Versión por bloques de leer(): produce DataFrames ya pivotados, en Voltios
+        y ordenados, con memoria acotada por 'chunksize' filas del CSV crudo.
+        Requiere que el CSV venga en orden cronológico entre bloques (como lo exportan los
+        sensores): una fila anterior a la frontera ya retenida lanza ValueError, porque
+        su instante ya se habría producido en otro bloque.
+        Si la lectura falla a mitad, la excepción se propaga tras los bloques ya producidos.
+        """
+        pendiente = None
+        try:
+            for bloque in pd.read_csv(ruta_archivo, sep=';', chunksize=chunksize):
+                bloque['tiempo'] = self.parser_tiempo.parsear_columna(bloque['tiempo'])
+                if pendiente is not None:
+                    frontera = pendiente['tiempo'].iloc[0]
+                    if bloque['tiempo'].min() < frontera:
+                        raise ValueError(
+                            f"CSV desordenado: lecturas anteriores a {frontera} en un bloque "
+                            f"posterior; leer() no requiere orden"
+                        )
+                    bloque = pd.concat([pendiente, bloque], ignore_index=True)
+
+                # Las medidas del último instante pueden continuar en el siguiente bloque:
+                # se retienen para que la media de duplicados se calcule completa
+                en_frontera = bloque['tiempo'] == bloque['tiempo'].max()
+                pendiente = bloque[en_frontera]
+                completas = bloque[~en_frontera]
+
+                if not completas.empty:
+                    yield self._pivotar(completas)
+
+            if pendiente is not None and not pendiente.empty:
+                yield self._pivotar(pendiente)
+
+        except Exception as e:
+            # A diferencia de leer(), un bloque parcial no es un resultado válido: quien
+            # consume el stream (histórico, entrenamiento) debe enterarse del fallo
+            print(f"Error leyendo el archivo CSV: {e}")
+            raise
+
+    def _pivotar(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Pivota, normaliza y ordena un bloque de filas crudas con 'tiempo' ya convertido."""
+        # 3. Pivotar (Transformación Estructural)
+        # Pasamos de tener medidas en filas a tener columnas:
+        # [timestamp, voltageReceiver1, voltageReceiver2, status]
+        df_pivot = df.pivot_table(
+            index='tiempo',
+            columns='medida',
+            values='valor',
+            aggfunc='mean'  # Por si hay duplicados en el mismo milisegundo
+        ).reset_index()
+
+        # Limpieza de nombres de columnas
+        df_pivot.columns.name = None
+        df_pivot = df_pivot.rename(columns={'tiempo': 'timestamp'})
+
+        # 4. Normalización de Unidades (Estandarización)
+        # Convertir mV a V para que el sistema trabaje en Voltios
+        cols_voltaje = ['voltageReceiver1', 'voltageReceiver2']
+        for col in cols_voltaje:
+            if col in df_pivot.columns:
+                df_pivot[col] = df_pivot[col] / 1000.0
+
+        # Ordenar cronológicamente es vital para las diferencias de tiempo
+        return df_pivot.sort_values('timestamp')
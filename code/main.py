@@ -2,7 +2,8 @@ from sistema_transporte import SistemaTransporte
 from cliente import Cliente
 
 if __name__ == "__main__":
-    # Instanciar el Sistema
+    # Instanciar el Sistema (las gráficas se guardan en ./graficas; con
+    # graficas_interactivas=True se abren en ventanas)
     sistema = SistemaTransporte()
 
     # Crear Clientes
@@ -17,5 +18,5 @@ if __name__ == "__main__":
     sistema.carga_datos("datos.csv")
     sistema.detectar_y_notificar()
 
-    # Ver gráficas (cerrar la ventana de la gráfica para que el programa termine)
+    # Ver gráficas
     sistema.ver_estadisticas(admin)
@@ -0,0 +1,162 @@
+import sys
+import threading
+import weakref
+import numpy as np
+from contextlib import contextmanager
+from multiprocessing.shared_memory import SharedMemory
+from typing import TYPE_CHECKING, Dict, Iterator, Mapping, NamedTuple, Sequence, Tuple
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Columnas del DataFrame pivotado de LectorCSV; 'timestamp' se guarda como 'ts_ns' (int64)
+COLUMNAS_PIVOTADAS = ('timestamp', 'voltageReceiver1', 'voltageReceiver2', 'status')
+_ALINEACION = 64
+
+
+class DescriptorSegmento(NamedTuple):
+    """Lo único que viaja a los workers: nombre del segmento y posición de cada columna."""
+    nombre: str
+    filas: int
+    columnas: Tuple[Tuple[str, str, int], ...]  # (columna, dtype, offset en bytes)
+
+
+def _liberar_segmento(shm: SharedMemory):
+    try:
+        shm.unlink()
+    except FileNotFoundError:
+        pass
+    try:
+        shm.close()
+    except BufferError:
+        # Aún quedan vistas del productor: el mapeo se libera cuando desaparezcan
+        pass
+
+
+class SegmentoCompartido:
+    """
+    Columnas de un bloque de lecturas en un segmento de memoria compartida.
+    El productor (ingesta) copia las columnas una vez; los consumidores reciben solo el
+    DescriptorSegmento y se adjuntan con 'adjuntar' para leerlas sin copia ni pickle.
+    Ciclo de vida por conteo de referencias: cada consumidor pendiente cuenta con
+    adquirir()/liberar() y el segmento se destruye cuando el productor ha llamado a
+    cerrar() y no queda ningún consumidor.
+    """
+
+    def __init__(self, columnas: Mapping[str, np.ndarray]):
+        arrays = {nombre: np.ascontiguousarray(valores) for nombre, valores in columnas.items()}
+        filas = {len(valores) for valores in arrays.values()}
+        if len(filas) != 1:
+            raise ValueError("Todas las columnas del segmento deben tener la misma longitud.")
+        self.filas = filas.pop()
+
+        # 1. Disposición: columnas consecutivas alineadas a 64 bytes
+        disposicion = []
+        tamano = 0
+        for nombre, valores in arrays.items():
+            tamano = -(-tamano // _ALINEACION) * _ALINEACION
+            disposicion.append((nombre, valores.dtype.str, tamano))
+            tamano += valores.nbytes
+
+        # 2. Copia única de los datos al segmento
+        self._shm = SharedMemory(create=True, size=max(tamano, 1))
+        self.descriptor = DescriptorSegmento(self._shm.name, self.filas, tuple(disposicion))
+        for (nombre, dtype, offset), valores in zip(disposicion, arrays.values()):
+            destino = np.ndarray(valores.shape, dtype=dtype, buffer=self._shm.buf, offset=offset)
+            destino[...] = valores
+            del destino
+
+        self._consumidores = 0
+        self._cerrado = False
+        self._lock = threading.Lock()
+        # Si el productor se pierde sin cerrar, el segmento no queda huérfano en /dev/shm
+        self._finalizador = weakref.finalize(self, _liberar_segmento, self._shm)
+
+    @classmethod
+    def desde_dataframe(cls, df: 'pd.DataFrame',
+                        columnas: Sequence[str] = COLUMNAS_PIVOTADAS) -> 'SegmentoCompartido':
+        """Publica las columnas pivotadas ('timestamp' pasa a 'ts_ns' en ns, el resto a float64)."""
+        arrays: Dict[str, np.ndarray] = {}
+        for col in columnas:
+            if col == 'timestamp':
+                arrays['ts_ns'] = df[col].to_numpy(dtype='datetime64[ns]').view(np.int64)
+            else:
+                arrays[col] = df[col].to_numpy(dtype=np.float64)
+        return cls(arrays)
+
+    @property
+    def nombre(self) -> str:
+        return self.descriptor.nombre
+
+    @property
+    def activo(self) -> bool:
+        return self._finalizador.alive
+
+    def vistas(self) -> Dict[str, np.ndarray]:
+        """Vistas de solo lectura en el propio productor (deben soltarse antes de que se destruya)."""
+        if not self.activo:
+            raise RuntimeError(f"El segmento {self.nombre} ya se liberó.")
+        return _vistas(self._shm, self.descriptor)
+
+    def adquirir(self) -> DescriptorSegmento:
+        """Registra un consumidor más y devuelve el descriptor que se le envía."""
+        with self._lock:
+            if self._cerrado or not self.activo:
+                raise RuntimeError(f"El segmento {self.nombre} está cerrado.")
+            self._consumidores += 1
+        return self.descriptor
+
+    def liberar(self):
+        """Un consumidor ha terminado; el último tras cerrar() destruye el segmento."""
+        with self._lock:
+            if self._consumidores == 0:
+                raise RuntimeError(f"liberar() sin adquirir() en el segmento {self.nombre}.")
+            self._consumidores -= 1
+            destruir = self._cerrado and self._consumidores == 0
+        if destruir:
+            self._finalizador()
+
+    def cerrar(self):
+        """El productor ya no lo necesita: se destruye ahora o al liberar el último consumidor."""
+        with self._lock:
+            self._cerrado = True
+            destruir = self._consumidores == 0
+        if destruir:
+            self._finalizador()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+
+def _vistas(shm: SharedMemory, descriptor: DescriptorSegmento) -> Dict[str, np.ndarray]:
+    vistas = {}
+    for nombre, dtype, offset in descriptor.columnas:
+        vista = np.ndarray((descriptor.filas,), dtype=dtype, buffer=shm.buf, offset=offset)
+        vista.flags.writeable = False
+        vistas[nombre] = vista
+    return vistas
+
+
+@contextmanager
+def adjuntar(descriptor: DescriptorSegmento) -> Iterator[Dict[str, np.ndarray]]:
+    """
+    Lado consumidor: vistas NumPy de solo lectura sobre el segmento, sin copiar.
+    Las vistas (y cualquier slice de ellas) no deben sobrevivir al bloque 'with';
+    lo que haya que conservar se copia.
+    """
+    # track=False: el segmento es del productor, el resource_tracker del worker no debe borrarlo
+    shm = SharedMemory(name=descriptor.nombre, track=False)
+    vistas = _vistas(shm, descriptor)
+    try:
+        yield vistas
+    finally:
+        vistas.clear()
+        try:
+            shm.close()
+        except BufferError:
+            if sys.exc_info()[0] is None:
+                raise RuntimeError(f"Quedan vistas del segmento {descriptor.nombre} "
+                                   "fuera del bloque 'with'; copia lo que necesites conservar.")
@@ -0,0 +1,196 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+from interfaces import Exportador
+
+
+class _TemporizadorNulo:
+    """Temporizador que no hace nada: lo que se paga con las métricas deshabilitadas."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_TEMPORIZADOR_NULO = _TemporizadorNulo()
+
+
+class _Temporizador:
+    __slots__ = ('metricas', 'nombre', 'inicio')
+
+    def __init__(self, metricas: 'Metricas', nombre: str):
+        self.metricas = metricas
+        self.nombre = nombre
+        self.inicio = 0.0
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metricas.observar(self.nombre, time.perf_counter() - self.inicio)
+        return False
+
+
+class Histograma:
+    """Histograma de cubetas fijas (acumulable y exportable a Prometheus)."""
+
+    __slots__ = ('limites', 'cubetas', 'suma', 'cuenta')
+
+    # Segundos: de 1us a 100s en potencias de 10
+    LIMITES_DEFECTO: Tuple[float, ...] = (1e-6, 1e-5, 1e-4, 1e-3, 1e-2, 0.1, 1.0, 10.0, 100.0)
+
+    def __init__(self, limites: Tuple[float, ...] = LIMITES_DEFECTO):
+        self.limites = limites
+        self.cubetas = [0] * (len(limites) + 1)  # La última es +Inf
+        self.suma = 0.0
+        self.cuenta = 0
+
+    def observar(self, valor: float):
+        self.cubetas[bisect_left(self.limites, valor)] += 1
+        self.suma += valor
+        self.cuenta += 1
+
+
+class Metricas:
+    """
+    Registro de contadores, temporizadores e histogramas de las etapas calientes
+    (carga, features, predicción, notificación). Deshabilitado por defecto: en ese
+    caso cada llamada solo comprueba un booleano.
+    """
+
+    def __init__(self, habilitado: bool = False):
+        self.habilitado = habilitado
+        self._contadores: Dict[str, float] = {}
+        self._histogramas: Dict[str, Histograma] = {}
+        self._lock = threading.Lock()
+
+    def habilitar(self, habilitado: bool = True):
+        self.habilitado = habilitado
+
+    def temporizador(self, nombre: str):
+        """Context manager que registra la duración (segundos) en el histograma 'nombre'."""
+        if not self.habilitado:
+            return _TEMPORIZADOR_NULO
+        return _Temporizador(self, nombre)
+
+    def contar(self, nombre: str, n: float = 1):
+        if not self.habilitado:
+            return
+        with self._lock:
+            self._contadores[nombre] = self._contadores.get(nombre, 0) + n
+
+    def observar(self, nombre: str, valor: float):
+        if not self.habilitado:
+            return
+        with self._lock:
+            histograma = self._histogramas.get(nombre)
+            if histograma is None:
+                histograma = self._histogramas[nombre] = Histograma()
+            histograma.observar(valor)
+
+    def instantanea(self) -> Dict:
+        with self._lock:
+            return {
+                'timestamp': time.time(),
+                'contadores': dict(self._contadores),
+                'histogramas': {
+                    nombre: {
+                        'limites': list(h.limites),
+                        'cubetas': list(h.cubetas),
+                        'suma': h.suma,
+                        'cuenta': h.cuenta
+                    }
+                    for nombre, h in self._histogramas.items()
+                }
+            }
+
+    def exportar(self, exportador: Exportador):
+        exportador.exportar(self.instantanea())
+
+    def reiniciar(self):
+        with self._lock:
+            self._contadores.clear()
+            self._histogramas.clear()
+
+
+class ExportadorMemoria(Exportador):
+    """Guarda las instantáneas en memoria (tests, depuración, endpoints propios)."""
+
+    def __init__(self, max_instantaneas: int = 100):
+        self.max_instantaneas = max_instantaneas
+        self.instantaneas: List[Dict] = []
+
+    def exportar(self, instantanea: dict):
+        self.instantaneas.append(instantanea)
+        del self.instantaneas[:-self.max_instantaneas]
+
+    @property
+    def ultima(self) -> Optional[Dict]:
+        return self.instantaneas[-1] if self.instantaneas else None
+
+
+class ExportadorJSONL(Exportador):
+    """Añade una línea JSON por exportación al fichero indicado."""
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+
+    def exportar(self, instantanea: dict):
+        with open(self.ruta, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(instantanea) + '\n')
+
+
+class ExportadorPrometheus(Exportador):
+    """
+    Formato de texto de Prometheus. Si se indica ruta, escribe el fichero de forma
+    atómica (apto para el textfile collector de node_exporter).
+    """
+
+    def __init__(self, ruta: Optional[str] = None, prefijo: str = 'is_p2'):
+        self.ruta = ruta
+        self.prefijo = prefijo
+        self.texto = ''
+
+    def exportar(self, instantanea: dict):
+        lineas = []
+        for nombre, valor in instantanea['contadores'].items():
+            metrica = f"{self.prefijo}_{nombre}_total"
+            lineas += [f"# TYPE {metrica} counter", f"{metrica} {valor}"]
+
+        for nombre, h in instantanea['histogramas'].items():
+            metrica = f"{self.prefijo}_{nombre}"
+            lineas.append(f"# TYPE {metrica} histogram")
+            acumulado = 0
+            for limite, cuenta in zip(h['limites'] + ['+Inf'], h['cubetas']):
+                acumulado += cuenta
+                lineas.append(f'{metrica}_bucket{{le="{limite}"}} {acumulado}')
+            lineas += [f"{metrica}_sum {h['suma']}", f"{metrica}_count {h['cuenta']}"]
+
+        self.texto = '\n'.join(lineas) + '\n'
+        if self.ruta:
+            temporal = f"{self.ruta}.tmp"
+            with open(temporal, 'w', encoding='utf-8') as f:
+                f.write(self.texto)
+            os.replace(temporal, self.ruta)
+
+
+def memoria_rss_mb() -> float:
+    """RSS actual del proceso en MB (en sistemas sin /proc, el máximo histórico)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# Registro global del proceso (deshabilitado hasta que se llame a METRICAS.habilitar())
+METRICAS = Metricas()
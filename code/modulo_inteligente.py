@@ -1,138 +1,448 @@
 import pandas as pd
 import numpy as np
-import xgboost as xgb
 import os
-from typing import List, Dict, Optional
+import json
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from parser_tiempo import ParserTiempo
+from features_ventana import ConfigVentanas, CalculadorVentanas, calcular_ventanas
+from metricas import METRICAS
+from incidencias import BufferIncidencias, Incidencia
+from reglas import MotorReglas
 
 
 class ModuloInteligente:
-    def __init__(self):
-        # Reglas de Negocio (RF2.1 del PDF)
-        self.UMBRAL_VOLTAJE = 0.5
-        self.LIMITE_TIEMPO_SEC = 120
-
-        # Modelo IA
-        self.model = xgb.XGBClassifier(
-            objective='multi:softmax',
-            num_class=3,
-            eval_metric='mlogloss',
-            use_label_encoder=False
-        )
+    FEATURES_BASE = ['voltageReceiver1', 'voltageReceiver2', 'status', 'delta_t', 'max_v_jump']
+
+    def __init__(self, ventanas: Optional[ConfigVentanas] = None, reglas: Optional[MotorReglas] = None):
+        # Reglas de Negocio (RF2.1 del PDF): una sola definición para etiquetar, detectar y evaluar
+        self.reglas = reglas or MotorReglas.por_defecto()
+        # Features de ventana deslizante (deriva lenta); sin configurar, solo la ventana de tamaño 1
+        self._configurar_ventanas(ventanas or ConfigVentanas())
+
+        # Modelo IA: XGBoost se importa y se construye en el primer uso (ver 'model')
+        self._model = None
         self.is_trained = False
+        # Marca de agua del histórico: última lectura (ns) ya usada para entrenar, por sensor
+        self.entrenado_hasta: Dict[str, int] = {}
 
         # --- MEMORIA PARA INFERENCIA (VENTANA DE TAMAÑO 1) ---
+        # 'ts' en nanosegundos desde epoch, 'v1'/'v2' en Voltios
         self.ultimo_estado: Optional[Dict] = None
+        self.parser_tiempo = ParserTiempo()
+
+    # Umbrales clásicos como atajo sobre las reglas por defecto (se pueden asignar)
+    @property
+    def UMBRAL_VOLTAJE(self) -> float:
+        return self.reglas.umbral('salto_voltaje')
+
+    @UMBRAL_VOLTAJE.setter
+    def UMBRAL_VOLTAJE(self, valor: float):
+        self.reglas = self.reglas.con_umbral('salto_voltaje', valor)
+
+    @property
+    def LIMITE_TIEMPO_SEC(self) -> float:
+        return self.reglas.umbral('bloqueo_datos')
+
+    @LIMITE_TIEMPO_SEC.setter
+    def LIMITE_TIEMPO_SEC(self, valor: float):
+        self.reglas = self.reglas.con_umbral('bloqueo_datos', valor)
+
+    @property
+    def model(self):
+        """Clasificador XGBoost; importar xgboost cuesta segundos y cientos de MB, solo se paga si se usa."""
+        if self._model is None:
+            import xgboost as xgb
+            self._model = xgb.XGBClassifier(
+                objective='multi:softmax',
+                num_class=3,
+                eval_metric='mlogloss',
+                use_label_encoder=False
+            )
+        return self._model
 
-    def _calcular_features_batch(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Calcula features para un bloque de datos (Entrenamiento)."""
+    def _configurar_ventanas(self, ventanas: ConfigVentanas):
+        self.ventanas = ventanas
+        self.FEATURES = self.FEATURES_BASE + ventanas.nombres()
+        # Estado incremental de las ventanas; se reinicia junto con ultimo_estado
+        self._calculador_ventanas = CalculadorVentanas(ventanas)
+
+    def _calcular_features_batch(self, df: pd.DataFrame, ventanas: bool = True) -> pd.DataFrame:
+        """
+        Calcula features para un bloque de datos (Entrenamiento).
+        Con ventanas=False se omiten las de ventana (las añade _enlazar_bloque).
+        """
         df_proc = df.copy()
         df_proc['delta_t'] = df_proc['timestamp'].diff().dt.total_seconds().fillna(0)
         v1_diff = df_proc['voltageReceiver1'].diff().abs().fillna(0)
         v2_diff = df_proc['voltageReceiver2'].diff().abs().fillna(0)
         df_proc['max_v_jump'] = pd.concat([v1_diff, v2_diff], axis=1).max(axis=1)
+        if ventanas and self.ventanas.nombres():
+            df_proc = pd.concat([df_proc, calcular_ventanas(df_proc, self.ventanas)], axis=1)
         return df_proc
 
-    def entrenar(self, datos_historicos: pd.DataFrame):
+    def entrenar(self, datos_historicos: pd.DataFrame, continuar: bool = False):
         """
         Entrena respetando el tiempo e inyectando datos sintéticos si faltan clases.
+        Con continuar=True y un modelo ya entrenado (o cargado) añade árboles sobre
+        los datos nuevos en lugar de reajustar todo el histórico.
         """
         print(f"   [Train] Procesando histórico de {len(datos_historicos)} registros...")
 
         # 1. Calcular features
         df = self._calcular_features_batch(datos_historicos)
+        self._entrenar_features(df, continuar)
 
+    def _entrenar_features(self, df: pd.DataFrame, continuar: bool = False):
+        """Pasos 2-4 de entrenar sobre features ya calculadas (reutilizable sin recalcularlas)."""
         # 2. Etiquetar (0: Normal, 1: Bloqueo, 2: Salto)
-        y = np.zeros(len(df))
-        y[df['delta_t'] > self.LIMITE_TIEMPO_SEC] = 1
-        mask_salto = (df['max_v_jump'] >= self.UMBRAL_VOLTAJE) & (y == 0)
-        y[mask_salto] = 2
+        y = self._etiquetar(df)
+        X = df[self.FEATURES].fillna(0)
+
+        # 3. INYECCIÓN SINTÉTICA si faltan clases
+        X_sintetico, y_sintetico = self._filas_sinteticas(np.unique(y))
+        if len(y_sintetico):
+            X = pd.concat([X, X_sintetico], ignore_index=True)
+            y = np.append(y, y_sintetico)
+
+        # 4. Entrenar (o continuar desde el booster actual)
+        if continuar and self.is_trained:
+            self.model.fit(X, y, xgb_model=self.model.get_booster())
+        else:
+            self.model.fit(X, y)
+            self.entrenado_hasta = {}
+        self.is_trained = True
+        print("   [Train] Modelo entrenado y listo.")
+
+    def entrenar_stream(self, fuente: Callable[[], Iterable[pd.DataFrame]], continuar: bool = False,
+                        abortar_si_rss_mb: Optional[float] = None, ruta_cache: Optional[str] = None):
+        """
+        Entrenamiento fuera de memoria: las features se calculan bloque a bloque y se
+        entregan a XGBoost con un DataIter, sin materializar el histórico.
+        'fuente' devuelve un iterable nuevo de bloques en cada llamada (p. ej.
+        lambda: lector.leer_stream(ruta, chunksize)), porque XGBoost recorre los datos varias veces.
+        Sin 'ruta_cache' los bloques se comprimen en un QuantileDMatrix en RAM (float32, hist);
+        con ella las páginas se guardan en disco (ExtMemQuantileDMatrix).
+        'abortar_si_rss_mb' es una comprobación a posteriori, no un presupuesto: tras
+        materializar cada bloque (y al terminar) se lanza MemoryError si el RSS del proceso
+        lo supera. No limita el tamaño de los bloques; eso lo decide 'fuente' (chunksize).
+        """
+        import xgboost as xgb
+        from iterador_entrenamiento import IteradorEntrenamiento
+
+        print("   [Train] Entrenamiento por bloques (fuera de memoria)...")
+        iterador = IteradorEntrenamiento(self, fuente, abortar_si_rss_mb, ruta_cache)
+        if ruta_cache:
+            dmatrix = xgb.ExtMemQuantileDMatrix(iterador)
+        else:
+            dmatrix = xgb.QuantileDMatrix(iterador)
+        print(f"   [Train] {iterador.filas} registros en {iterador.bloques} bloques.")
+
+        # 4. Entrenar (o continuar desde el booster actual) con la API nativa
+        params = {**self.model.get_xgb_params(), 'tree_method': 'hist'}
+        booster = xgb.train(
+            params, dmatrix,
+            num_boost_round=self.model.n_estimators or 100,
+            xgb_model=self.model.get_booster() if continuar and self.is_trained else None
+        )
+        iterador.comprobar_memoria()
+        if not (continuar and self.is_trained):
+            self.entrenado_hasta = {}
+        self.model.load_model(bytearray(booster.save_raw('ubj')))
+        self.is_trained = True
+        print("   [Train] Modelo entrenado y listo.")
 
-        features = ['voltageReceiver1', 'voltageReceiver2', 'status', 'delta_t', 'max_v_jump']
-        X = df[features].fillna(0)
+    def _etiquetar(self, df: pd.DataFrame) -> np.ndarray:
+        """Etiquetas a partir de las reglas (0: Normal, 1: Bloqueo, 2: Salto)."""
+        sensores = df['sensor'].to_numpy() if 'sensor' in df.columns else None
+        return self.reglas.etiquetar(df, sensores)
 
-        # 3. INYECCIÓN SINTÉTICA (Corrección del typo aquí)
-        clases_presentes = np.unique(y)  # Variable definida en español
+    def _filas_sinteticas(self, clases_presentes: np.ndarray) -> Tuple[pd.DataFrame, np.ndarray]:
+        """Casos sintéticos de las clases que no aparecen en el histórico."""
+        filas = []
+        etiquetas = []
 
         # Inyección Bloqueo (Clase 1)
-        if 1 not in clases_presentes:  # Uso correcto: 'clases_presentes'
+        if 1 not in clases_presentes:
             print("   [Info] Inyectando caso sintético de BLOQUEO (Clase 1)")
-            row_bloqueo = pd.DataFrame([{
+            filas.append({
                 'voltageReceiver1': 1.5, 'voltageReceiver2': 1.5, 'status': 1,
                 'delta_t': 300.0,
                 'max_v_jump': 0.0
-            }])
-            X = pd.concat([X, row_bloqueo], ignore_index=True)
-            y = np.append(y, 1)
+            })
+            etiquetas.append(1)
 
         # Inyección Salto (Clase 2)
-        if 2 not in clases_presentes:  # Uso correcto: 'clases_presentes'
+        if 2 not in clases_presentes:
             print("   [Info] Inyectando caso sintético de SALTO (Clase 2)")
-            row_salto = pd.DataFrame([{
+            filas.append({
                 'voltageReceiver1': 2.5, 'voltageReceiver2': 1.5, 'status': 1,
                 'delta_t': 60.0,
                 'max_v_jump': 1.0
-            }])
-            X = pd.concat([X, row_salto], ignore_index=True)
-            y = np.append(y, 2)
+            })
+            etiquetas.append(2)
+
+        # Las filas sintéticas no traen features de ventana
+        X = pd.DataFrame(filas, columns=self.FEATURES).fillna(0)
+        return X, np.array(etiquetas, dtype=np.float64)
 
-        # 4. Entrenar
-        self.model.fit(X, y)
+    def guardar_modelo(self, ruta: str):
+        """
+        Guarda el modelo en el formato nativo de XGBoost (.json o .ubj según la extensión)
+        junto con reglas y features, para arrancar sin reentrenar.
+        """
+        if not self.is_trained:
+            raise RuntimeError("No hay modelo entrenado que guardar.")
+        booster = self.model.get_booster()
+        booster.set_attr(modulo_inteligente=json.dumps({
+            'REGLAS': self.reglas.a_dicts(),
+            'FEATURES': self.FEATURES,
+            'VENTANAS': self.ventanas.a_dict(),
+            'ENTRENADO_HASTA': self.entrenado_hasta
+        }))
+        self.model.save_model(ruta)
+        print(f"   [Modelo] Guardado en {ruta}")
+
+    def cargar_modelo(self, ruta: str):
+        """Carga un modelo guardado con guardar_modelo y restaura su configuración."""
+        self.model.load_model(ruta)
+        meta = self.model.get_booster().attr('modulo_inteligente')
+        if meta is not None:
+            config = json.loads(meta)
+            if 'REGLAS' in config:
+                self.reglas = MotorReglas.desde_dicts(config['REGLAS'])
+            else:
+                # Modelos guardados antes del motor de reglas
+                self.reglas = MotorReglas.por_defecto(config['LIMITE_TIEMPO_SEC'], config['UMBRAL_VOLTAJE'])
+            self._configurar_ventanas(ConfigVentanas.desde_dict(config.get('VENTANAS', {})))
+            self.FEATURES = config['FEATURES']
+            self.entrenado_hasta = config.get('ENTRENADO_HASTA', {})
         self.is_trained = True
-        print("   [Train] Modelo entrenado y listo.")
+        print(f"   [Modelo] Cargado desde {ruta}")
 
-    def predecir_tiempo_real(self, lectura_actual: Dict) -> List[Dict]:
+    def predecir_tiempo_real(self, lectura_actual: Dict) -> List[Incidencia]:
         """Inferencia dato a dato con memoria (Stateful)."""
-        ts_actual = pd.to_datetime(lectura_actual['timestamp'], dayfirst=True)
+        ts_ns = self.parser_tiempo.parsear_escalar(lectura_actual['timestamp'])
         # Normalizar a Voltios (asumiendo que entra en mV desde el sensor simulado)
         v1 = float(lectura_actual['voltageReceiver1']) / 1000.0
         v2 = float(lectura_actual['voltageReceiver2']) / 1000.0
         status = lectura_actual['status']
 
         # 1. Calcular deltas usando la MEMORIA
+        METRICAS.contar('lecturas')
         delta_t = 0.0
         max_jump = 0.0
 
         if self.ultimo_estado is not None:
-            ts_prev = self.ultimo_estado['ts']
-            delta_t = (ts_actual - ts_prev).total_seconds()
+            delta_t = self._a_segundos(ts_ns - self.ultimo_estado['ts'])
 
             jump_v1 = abs(v1 - self.ultimo_estado['v1'])
             jump_v2 = abs(v2 - self.ultimo_estado['v2'])
             max_jump = max(jump_v1, jump_v2)
+        else:
+            self._calculador_ventanas.reiniciar()
+
+        # Features de ventana: coste constante por lectura (buffers incrementales)
+        valores = {'voltageReceiver1': v1, 'voltageReceiver2': v2}
+        extra = self._calculador_ventanas.actualizar(
+            ts_ns, [valores[col] for col in self.ventanas.columnas], float(status))
 
         # 2. Actualizar memoria
         self.ultimo_estado = {
-            'ts': ts_actual,
+            'ts': ts_ns,
             'v1': v1,
             'v2': v2
         }
 
         # 3. Preparar dato para modelo
-        input_data = pd.DataFrame([{
+        features = {
             'voltageReceiver1': v1,
             'voltageReceiver2': v2,
             'status': status,
             'delta_t': delta_t,
-            'max_v_jump': max_jump
-        }])
+            'max_v_jump': max_jump,
+            **dict(zip(self.ventanas.nombres(), np.nan_to_num(extra)))
+        }
 
         # 4. Predicción Híbrida
-        incidencias = []
+        pred_class = None
+        if self.is_trained:
+            with METRICAS.temporizador('prediccion_segundos'):
+                pred_class = self.model.predict(pd.DataFrame([features]))[0]
+
+        # Reglas deterministas y, si la IA ve algo sutil que la regla estricta no, su aviso
+        sensor = lectura_actual.get('sensor')
+        incidencias = [Incidencia(codigo, valor, ts_ns, sensor) for codigo, valor in
+                       self.reglas.detectar_escalar(features, pred_class, sensor)]
 
-        # Reglas Deterministas
-        if delta_t > self.LIMITE_TIEMPO_SEC:
-            incidencias.append({"tipo": "BLOQUEO_DATOS", "valor": f"{delta_t}s", "timestamp": ts_actual})
+        METRICAS.contar('incidencias', len(incidencias))
+        return incidencias
 
-        if max_jump >= self.UMBRAL_VOLTAJE:
-            incidencias.append({"tipo": "SALTO_VOLTAJE", "valor": f"{max_jump:.2f}V", "timestamp": ts_actual})
+    def analizar_todo(self, datos: pd.DataFrame, continuar: bool = False) -> BufferIncidencias:
+        """
+        Detección vectorizada sobre un DataFrame completo (ya normalizado a Voltios).
+        Mismas reglas y modelo que el tiempo real, sin bucles por fila.
+        Con continuar=True el bloque se enlaza con ultimo_estado (lectura por bloques),
+        de modo que analizar los bloques seguidos equivale a analizar el fichero entero.
+        """
+        if datos is None or datos.empty:
+            return BufferIncidencias(0)
+
+        METRICAS.contar('lecturas', len(datos))
+        with METRICAS.temporizador('features_segundos'):
+            df = self._calcular_features_batch(datos, ventanas=not continuar)
+            if continuar:
+                self.ultimo_estado = self._enlazar_bloque(df, self.ultimo_estado, self._calculador_ventanas)
+        ts_ns = df['timestamp'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+        X = df[self.FEATURES].fillna(0)
+        nombres_ventana = self.ventanas.nombres()
+
+        return self._analizar_arrays(
+            ts_ns,
+            X['voltageReceiver1'].to_numpy(dtype=np.float64),
+            X['voltageReceiver2'].to_numpy(dtype=np.float64),
+            X['status'].to_numpy(dtype=np.float64),
+            X['delta_t'].to_numpy(dtype=np.float64),
+            X['max_v_jump'].to_numpy(dtype=np.float64),
+            sensores=df['sensor'].to_numpy() if 'sensor' in df.columns else None,
+            ventanas=X[nombres_ventana].to_numpy(dtype=np.float64) if nombres_ventana else None
+        )
+
+    def _enlazar_bloque(self, df: pd.DataFrame, previo: Optional[Dict],
+                        calculador: CalculadorVentanas) -> Dict:
+        """
+        Corrige en sitio las features de la primera fila de un bloque con la última
+        lectura del anterior ('previo', mismo formato que ultimo_estado) y añade las de
+        ventana continuando el estado de 'calculador' (vectorizado, por bloque).
+        Devuelve el estado para el bloque siguiente.
+        """
+        ts_ns = df['timestamp'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+        v1 = df['voltageReceiver1'].to_numpy(dtype=np.float64)
+        v2 = df['voltageReceiver2'].to_numpy(dtype=np.float64)
+        if previo is not None:
+            df.iloc[0, df.columns.get_loc('delta_t')] = self._a_segundos(np.int64(ts_ns[0] - previo['ts']))
+            saltos = np.nan_to_num([abs(v1[0] - previo['v1']), abs(v2[0] - previo['v2'])])
+            df.iloc[0, df.columns.get_loc('max_v_jump')] = saltos.max()
+
+        nombres_ventana = self.ventanas.nombres()
+        if nombres_ventana:
+            # Las ventanas cruzan la frontera del bloque: se calculan desde el estado incremental
+            if previo is None:
+                calculador.reiniciar()
+            valores = df[list(self.ventanas.columnas)].to_numpy(dtype=np.float64)
+            df[nombres_ventana] = calculador.actualizar_bloque(
+                ts_ns, valores, df['status'].to_numpy(dtype=np.float64))
+
+        return {'ts': int(ts_ns[-1]), 'v1': float(v1[-1]), 'v2': float(v2[-1])}
+
+    def predecir_lote(self, lecturas) -> BufferIncidencias:
+        """
+        Inferencia por micro-lotes con la misma memoria que predecir_tiempo_real.
+        Acepta una lista de lecturas (dicts) o cualquier estructura columnar
+        (DataFrame, dict de arrays) con las mismas claves y en el mismo orden de llegada.
+        Devuelve exactamente las mismas incidencias que llamar dato a dato.
+        """
+        lote = lecturas if isinstance(lecturas, pd.DataFrame) else pd.DataFrame(lecturas)
+        if lote.empty:
+            return BufferIncidencias(0)
+
+        # 1. Normalización vectorizada (una sola pasada por columna)
+        ts = self.parser_tiempo.parsear_columna(lote['timestamp'])
+        ts_ns = ts.to_numpy(dtype='datetime64[ns]').view(np.int64)
+        v1 = lote['voltageReceiver1'].to_numpy(dtype=np.float64) / 1000.0
+        v2 = lote['voltageReceiver2'].to_numpy(dtype=np.float64) / 1000.0
+        status = lote['status'].to_numpy(dtype=np.float64)
+
+        # 2. Features con la MEMORIA del lote anterior
+        METRICAS.contar('lecturas', len(lote))
+        with METRICAS.temporizador('features_segundos'):
+            delta_t, max_jump = self._calcular_features_stream(ts_ns, v1, v2)
+            ventanas = None
+            if self.ventanas.nombres():
+                if self.ultimo_estado is None:
+                    self._calculador_ventanas.reiniciar()
+                columnas = pd.DataFrame({'voltageReceiver1': v1, 'voltageReceiver2': v2, 'status': status})
+                ventanas = np.nan_to_num(self._actualizar_ventanas(columnas, ts_ns))
+
+        # 3. Actualizar memoria con la última lectura del lote
+        self.ultimo_estado = {
+            'ts': int(ts_ns[-1]),
+            'v1': float(v1[-1]),
+            'v2': float(v2[-1])
+        }
+
+        sensores = lote['sensor'].to_numpy() if 'sensor' in lote.columns else None
+        return self._analizar_arrays(ts_ns, v1, v2, status, delta_t, max_jump,
+                                     sensores=sensores, ventanas=ventanas)
+
+    def _actualizar_ventanas(self, df: pd.DataFrame, ts_ns: np.ndarray) -> np.ndarray:
+        """Features de ventana de un bloque continuando el estado incremental."""
+        valores = df[list(self.ventanas.columnas)].to_numpy(dtype=np.float64)
+        status = df['status'].to_numpy(dtype=np.float64)
+        return self._calculador_ventanas.actualizar_bloque(ts_ns, valores, status)
+
+    def _calcular_features_stream(self, ts_ns: np.ndarray, v1: np.ndarray,
+                                  v2: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Calcula delta_t y max_v_jump de un lote enlazándolo con ultimo_estado."""
+        diff_ns = np.empty(len(ts_ns), dtype=np.int64)
+        diff_ns[1:] = np.diff(ts_ns)
+        salto_v1 = np.empty(len(v1))
+        salto_v2 = np.empty(len(v2))
+        salto_v1[1:] = np.abs(np.diff(v1))
+        salto_v2[1:] = np.abs(np.diff(v2))
+
+        if self.ultimo_estado is not None:
+            diff_ns[0] = ts_ns[0] - self.ultimo_estado['ts']
+            salto_v1[0] = abs(v1[0] - self.ultimo_estado['v1'])
+            salto_v2[0] = abs(v2[0] - self.ultimo_estado['v2'])
+        else:
+            diff_ns[0] = 0
+            salto_v1[0] = 0.0
+            salto_v2[0] = 0.0
+
+        return self._a_segundos(diff_ns), np.maximum(salto_v1, salto_v2)
 
-        # Predicción IA
+    @staticmethod
+    def _a_segundos(diff_ns: np.ndarray) -> np.ndarray:
+        """Misma aritmética que Timedelta.total_seconds() (resolución de microsegundos)."""
+        diff_us = diff_ns // 1000
+        return (diff_us // 1_000_000) + (diff_us % 1_000_000) / 1e6
+
+    def _analizar_arrays(self, ts_ns: np.ndarray, v1: np.ndarray, v2: np.ndarray,
+                         status: np.ndarray, delta_t: np.ndarray,
+                         max_jump: np.ndarray, sensores: Optional[np.ndarray] = None,
+                         ventanas: Optional[np.ndarray] = None) -> BufferIncidencias:
+        """
+        Reglas + IA sobre arrays de features ya calculadas (una sola llamada a predict).
+        Si se pasan 'sensores', cada incidencia lleva además su sensor.
+        'ventanas' son las features de ventana en el orden de self.ventanas.nombres().
+        """
+        incidencias, _ = self._analizar_arrays_filas(ts_ns, v1, v2, status, delta_t, max_jump,
+                                                     sensores, ventanas)
+        return incidencias
+
+    def _analizar_arrays_filas(self, ts_ns: np.ndarray, v1: np.ndarray, v2: np.ndarray,
+                               status: np.ndarray, delta_t: np.ndarray,
+                               max_jump: np.ndarray, sensores: Optional[np.ndarray] = None,
+                               ventanas: Optional[np.ndarray] = None) -> Tuple[BufferIncidencias, np.ndarray]:
+        """Como _analizar_arrays, pero devuelve también la fila de entrada de cada incidencia."""
+        columnas = [v1, v2, status, delta_t, max_jump]
+        features = dict(zip(self.FEATURES_BASE, columnas))
+        if ventanas is not None:
+            columnas.append(ventanas)
+            features.update(zip(self.ventanas.nombres(), ventanas.T))
+
+        # Predicción IA sobre una matriz float32 contigua
+        pred_class = None
         if self.is_trained:
-            pred_class = self.model.predict(input_data)[0]
-            # Si la IA ve algo sutil que la regla estricta no (redundancia)
-            if pred_class == 1 and delta_t <= self.LIMITE_TIEMPO_SEC:
-                incidencias.append({"tipo": "POSIBLE_BLOQUEO (IA)", "valor": "Predicción", "timestamp": ts_actual})
-            if pred_class == 2 and max_jump < self.UMBRAL_VOLTAJE:
-                incidencias.append({"tipo": "POSIBLE_SALTO (IA)", "valor": "Predicción", "timestamp": ts_actual})
-
-        return incidencias
\ No newline at end of file
+            X = np.column_stack(columnas).astype(np.float32)
+            with METRICAS.temporizador('prediccion_segundos'):
+                pred_class = self.model.predict(X)
+
+        # Reglas (máscaras compiladas) + avisos de la IA, en el mismo orden que el dato a dato
+        filas, codigos, valores = self.reglas.detectar(features, pred_class, sensores)
+
+        incidencias = BufferIncidencias(len(filas))
+        incidencias.extender(codigos, valores, ts_ns[filas], None if sensores is None else sensores[filas])
+        METRICAS.contar('incidencias', len(incidencias))
+        return incidencias, filas
+
@@ -0,0 +1,293 @@
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Hashable, Optional, Tuple
+from modulo_inteligente import ModuloInteligente
+from incidencias import BufferIncidencias
+from memoria_compartida import DescriptorSegmento, SegmentoCompartido, adjuntar
+from reglas import MotorReglas
+
+# Estado por sensor en forma struct-of-arrays: (ts_ns, v1, v2, iniciado)
+Estado = Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+# Modelo compartido por todas las particiones que procesa un mismo worker
+_modulo_worker: Optional[ModuloInteligente] = None
+
+
+def _inicializar_worker(modelo_ubj: Optional[bytes], reglas: MotorReglas):
+    """Carga el modelo una sola vez por proceso del pool."""
+    global _modulo_worker
+    modulo = ModuloInteligente(reglas=reglas)
+    if modelo_ubj is not None:
+        modulo.model.load_model(bytearray(modelo_ubj))
+        # Un hilo por proceso: el paralelismo ya lo pone el pool
+        modulo.model.set_params(n_jobs=1)
+        modulo.is_trained = True
+    _modulo_worker = modulo
+
+
+def _procesar_particion(locales, sensores, ts_ns, v1, v2, status, estado):
+    return _detectar(_modulo_worker, locales, sensores, ts_ns, v1, v2, status, estado)
+
+
+def _analizar_tramo(descriptor: DescriptorSegmento, inicio: int, fin: int) -> BufferIncidencias:
+    """Worker: se adjunta al segmento compartido y analiza sus filas [inicio, fin)."""
+    with adjuntar(descriptor) as columnas:
+        return _detectar_tramo(_modulo_worker, columnas, inicio, fin)
+
+
+def _detectar_tramo(modulo: ModuloInteligente, columnas: Dict[str, np.ndarray],
+                    inicio: int, fin: int) -> BufferIncidencias:
+    """
+    Detección de las filas [inicio, fin) de una única serie pivotada, con las mismas
+    features que analizar_todo: la primera fila se enlaza con la fila inicio - 1,
+    así que los tramos se analizan por separado y en cualquier orden.
+    """
+    desde = max(inicio - 1, 0)
+    ts_ns = columnas['ts_ns'][desde:fin]
+    v1 = columnas['voltageReceiver1'][desde:fin]
+    v2 = columnas['voltageReceiver2'][desde:fin]
+
+    # 1. Diferencias con la fila anterior (la primera de la serie no tiene anterior)
+    diff_ns = np.diff(ts_ns)
+    max_jump = np.maximum(np.nan_to_num(np.abs(np.diff(v1))), np.nan_to_num(np.abs(np.diff(v2))))
+    if inicio == 0:
+        diff_ns = np.concatenate(([0], diff_ns))
+        max_jump = np.concatenate(([0.0], max_jump))
+    delta_t = ModuloInteligente._a_segundos(diff_ns)
+
+    # 2. Reglas + IA; los huecos se rellenan con 0 como en analizar_todo
+    fila = inicio - desde
+    return modulo._analizar_arrays(
+        ts_ns[fila:],
+        np.nan_to_num(v1[fila:]),
+        np.nan_to_num(v2[fila:]),
+        np.nan_to_num(columnas['status'][inicio:fin]),
+        delta_t,
+        max_jump
+    )
+
+
+def _detectar(modulo: ModuloInteligente, locales: np.ndarray, sensores: np.ndarray,
+              ts_ns: np.ndarray, v1: np.ndarray, v2: np.ndarray, status: np.ndarray,
+              estado: Estado) -> Tuple[BufferIncidencias, np.ndarray, Estado]:
+    """
+    Detección de lecturas intercaladas de varios sensores.
+    'locales' indexa 'estado' (0..k-1). Dentro de cada sensor las lecturas deben
+    llegar en orden cronológico; entre sensores pueden venir mezcladas.
+    Devuelve las incidencias en orden de llegada, la fila de cada una y el nuevo estado.
+    """
+    estado_ts, estado_v1, estado_v2, estado_ok = estado
+
+    # 1. Agrupar por sensor conservando el orden de llegada dentro de cada grupo
+    orden = np.argsort(locales, kind='stable')
+    s = locales[orden]
+    ts = ts_ns[orden]
+    a = v1[orden]
+    b = v2[orden]
+    n = len(s)
+
+    inicio = np.ones(n, dtype=bool)
+    inicio[1:] = s[1:] != s[:-1]
+    fin = np.ones(n, dtype=bool)
+    fin[:-1] = inicio[1:]
+
+    # 2. Diferencias dentro de cada sensor; la primera lectura se enlaza con su estado
+    diff_ns = np.empty(n, dtype=np.int64)
+    diff_ns[1:] = np.diff(ts)
+    salto_v1 = np.empty(n)
+    salto_v2 = np.empty(n)
+    salto_v1[1:] = np.abs(np.diff(a))
+    salto_v2[1:] = np.abs(np.diff(b))
+
+    previo = s[inicio]
+    ok = estado_ok[previo]
+    diff_ns[inicio] = np.where(ok, ts[inicio] - estado_ts[previo], 0)
+    salto_v1[inicio] = np.where(ok, np.abs(a[inicio] - estado_v1[previo]), 0.0)
+    salto_v2[inicio] = np.where(ok, np.abs(b[inicio] - estado_v2[previo]), 0.0)
+
+    # Volver al orden de llegada
+    delta_t = np.empty(n)
+    max_jump = np.empty(n)
+    delta_t[orden] = ModuloInteligente._a_segundos(diff_ns)
+    max_jump[orden] = np.maximum(salto_v1, salto_v2)
+
+    # 3. Nuevo estado: última lectura de cada sensor
+    ultimos = s[fin]
+    nuevo_ts, nuevo_v1, nuevo_v2, nuevo_ok = (x.copy() for x in estado)
+    nuevo_ts[ultimos] = ts[fin]
+    nuevo_v1[ultimos] = a[fin]
+    nuevo_v2[ultimos] = b[fin]
+    nuevo_ok[ultimos] = True
+
+    incidencias, filas = modulo._analizar_arrays_filas(ts_ns, v1, v2, status, delta_t, max_jump, sensores)
+    return incidencias, filas, (nuevo_ts, nuevo_v1, nuevo_v2, nuevo_ok)
+
+
+class MotorDeteccion:
+    """
+    Motor de detección multi-sensor (circuitos de vía / receptores).
+    Equivale a tener un ModuloInteligente.ultimo_estado por sensor, pero guardado
+    en arrays contiguos indexados por sensor, y reparte los sensores en un pool
+    de procesos donde cada worker carga el modelo una única vez.
+    """
+
+    def __init__(self, modulo: ModuloInteligente, num_procesos: int = 1,
+                 capacidad_inicial: int = 256, min_lecturas_paralelo: int = 50_000):
+        if modulo.ventanas.nombres():
+            # El estado por sensor solo guarda la última lectura, no los buffers de ventana
+            raise ValueError("MotorDeteccion requiere un ModuloInteligente sin features de ventana.")
+        self.modulo = modulo
+        self.num_procesos = num_procesos
+        self.min_lecturas_paralelo = min_lecturas_paralelo
+
+        self._indices: Dict[Hashable, int] = {}
+        self._ts = np.zeros(capacidad_inicial, dtype=np.int64)
+        self._v1 = np.zeros(capacidad_inicial)
+        self._v2 = np.zeros(capacidad_inicial)
+        self._iniciado = np.zeros(capacidad_inicial, dtype=bool)
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def procesar(self, lecturas) -> BufferIncidencias:
+        """
+        Procesa lecturas crudas intercaladas (columnas: sensor, timestamp,
+        voltageReceiver1/2 en mV, status). Devuelve incidencias con su sensor, en el
+        orden de las lecturas que las producen (el mismo con y sin pool de procesos).
+        """
+        lote = lecturas if isinstance(lecturas, pd.DataFrame) else pd.DataFrame(lecturas)
+        if lote.empty:
+            return BufferIncidencias(0)
+
+        ts = self.modulo.parser_tiempo.parsear_columna(lote['timestamp'])
+        ts_ns = ts.to_numpy(dtype='datetime64[ns]').view(np.int64)
+        v1 = lote['voltageReceiver1'].to_numpy(dtype=np.float64) / 1000.0
+        v2 = lote['voltageReceiver2'].to_numpy(dtype=np.float64) / 1000.0
+        status = lote['status'].to_numpy(dtype=np.float64)
+        sensores = lote['sensor'].to_numpy()
+        slots = self._slots(sensores)
+
+        if self.num_procesos <= 1 or len(lote) < self.min_lecturas_paralelo:
+            unicos, locales = np.unique(slots, return_inverse=True)
+            incidencias, _, nuevo = _detectar(self.modulo, locales, sensores, ts_ns, v1, v2,
+                                              status, self._estado(unicos))
+            self._guardar_estado(unicos, nuevo)
+            return incidencias
+
+        # Particiones por sensor: cada sensor siempre cae en la misma partición
+        particion = slots % self.num_procesos
+        pool = self._obtener_pool()
+        tareas = []
+        for p in range(self.num_procesos):
+            filas = np.flatnonzero(particion == p)
+            if len(filas) == 0:
+                continue
+            unicos, locales = np.unique(slots[filas], return_inverse=True)
+            futuro = pool.submit(_procesar_particion, locales, sensores[filas], ts_ns[filas],
+                                 v1[filas], v2[filas], status[filas], self._estado(unicos))
+            tareas.append((unicos, filas, futuro))
+
+        # Cada partición llega en su orden de llegada: se intercalan por fila de entrada
+        parciales = []
+        origen = []
+        for unicos, filas, futuro in tareas:
+            incidencias, filas_locales, nuevo = futuro.result()
+            self._guardar_estado(unicos, nuevo)
+            parciales.append(incidencias)
+            origen.append(filas[filas_locales])
+        orden = np.argsort(np.concatenate(origen), kind='stable')
+        return BufferIncidencias.concatenar(parciales).reordenar(orden)
+
+    def analizar_compartido(self, segmento: SegmentoCompartido) -> BufferIncidencias:
+        """
+        Equivalente a modulo.analizar_todo sobre una serie publicada en memoria compartida
+        (p. ej. con LectorCSV.leer_compartido). Los workers reciben solo el descriptor y
+        un rango de filas, y leen las columnas sin copia. No usa ni modifica el estado por sensor.
+        El segmento sigue siendo del llamador, que lo cierra cuando ya no lo necesite.
+        """
+        n = segmento.filas
+        if n == 0:
+            return BufferIncidencias(0)
+        if self.num_procesos <= 1 or n < self.min_lecturas_paralelo:
+            columnas = segmento.vistas()
+            try:
+                return _detectar_tramo(self.modulo, columnas, 0, n)
+            finally:
+                columnas.clear()
+
+        # Tramos contiguos: concatenados en orden ya quedan ordenados por tiempo
+        limites = np.linspace(0, n, self.num_procesos + 1, dtype=np.int64).tolist()
+        pool = self._obtener_pool()
+        futuros = []
+        try:
+            for inicio, fin in zip(limites[:-1], limites[1:]):
+                if fin > inicio:
+                    descriptor = segmento.adquirir()
+                    try:
+                        futuros.append(pool.submit(_analizar_tramo, descriptor, inicio, fin))
+                    except BaseException:
+                        segmento.liberar()
+                        raise
+            return BufferIncidencias.concatenar([futuro.result() for futuro in futuros])
+        finally:
+            # Cada tramo suelta su referencia al terminar (también si otro ha fallado)
+            for futuro in futuros:
+                futuro.exception()
+                segmento.liberar()
+
+    def estado_sensor(self, sensor: Hashable) -> Optional[Dict]:
+        """Memoria del sensor con el mismo formato que ModuloInteligente.ultimo_estado."""
+        slot = self._indices.get(sensor)
+        if slot is None or not self._iniciado[slot]:
+            return None
+        return {'ts': int(self._ts[slot]), 'v1': float(self._v1[slot]), 'v2': float(self._v2[slot])}
+
+    def cerrar(self):
+        """Detiene el pool (se recrea con el modelo actual en la siguiente llamada)."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    def _obtener_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            modelo = self.modulo.model.get_booster().save_raw('ubj') if self.modulo.is_trained else None
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.num_procesos,
+                initializer=_inicializar_worker,
+                initargs=(modelo, self.modulo.reglas)
+            )
+        return self._pool
+
+    def _slots(self, sensores: np.ndarray) -> np.ndarray:
+        # Solo se recorre en Python la lista de sensores distintos, no las lecturas
+        codigos, unicos = pd.factorize(sensores)
+        mapa = np.array([self._slot(sensor) for sensor in unicos], dtype=np.int64)
+        return mapa[codigos]
+
+    def _slot(self, sensor: Hashable) -> int:
+        slot = self._indices.get(sensor)
+        if slot is None:
+            slot = len(self._indices)
+            if slot == len(self._ts):
+                self._crecer()
+            self._indices[sensor] = slot
+        return slot
+
+    def _crecer(self):
+        capacidad = 2 * len(self._ts)
+        for nombre in ('_ts', '_v1', '_v2', '_iniciado'):
+            viejo = getattr(self, nombre)
+            nuevo = np.zeros(capacidad, dtype=viejo.dtype)
+            nuevo[:len(viejo)] = viejo
+            setattr(self, nombre, nuevo)
+
+    def _estado(self, slots: np.ndarray) -> Estado:
+        return self._ts[slots], self._v1[slots], self._v2[slots], self._iniciado[slots]
+
+    def _guardar_estado(self, slots: np.ndarray, estado: Estado):
+        self._ts[slots], self._v1[slots], self._v2[slots], self._iniciado[slots] = estado
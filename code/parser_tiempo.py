@@ -0,0 +1,117 @@
+import pandas as pd
+import numpy as np
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+
+class ParserTiempo:
+    """
+    Capa de parseo de timestamps: detecta el formato una sola vez y lo reutiliza.
+    - Columnas: pd.to_datetime con formato explícito o ruta vectorizada de epoch int64.
+    - Lecturas sueltas: datetime.strptime con el formato cacheado (sin pandas).
+    """
+
+    # Candidatos en orden de preferencia (día primero, como los CSV de los sensores)
+    FORMATOS = [
+        '%d/%m/%Y %H:%M:%S.%f',
+        '%d/%m/%Y %H:%M:%S',
+        '%d/%m/%Y %H:%M',
+        '%d-%m-%Y %H:%M:%S.%f',
+        '%d-%m-%Y %H:%M:%S',
+        '%Y-%m-%d %H:%M:%S.%f',
+        '%Y-%m-%d %H:%M:%S',
+        '%Y-%m-%dT%H:%M:%S.%f',
+        '%Y-%m-%dT%H:%M:%S',
+        '%d/%m/%Y',
+        '%Y-%m-%d',
+    ]
+    # Factor a nanosegundos según la magnitud del epoch (s, ms, us, ns)
+    _ESCALAS_EPOCH = [(1e11, 1_000_000_000), (1e14, 1_000_000), (1e17, 1_000), (float('inf'), 1)]
+    _EPOCH = datetime(1970, 1, 1)
+    _UN_MICRO = timedelta(microseconds=1)
+
+    def __init__(self, formato: Optional[str] = None, tam_muestra: int = 100):
+        self.formato = formato
+        # 'formato' se sobrescribe al autodetectar; el configurado es el que identifica la salida
+        self.formato_configurado = formato
+        self.tam_muestra = tam_muestra
+        self.factor_epoch: Optional[int] = None
+
+    def detectar_formato(self, muestra: List[str]) -> Optional[str]:
+        """Devuelve el primer formato candidato que encaja con toda la muestra (o None)."""
+        for formato in self.FORMATOS:
+            try:
+                for valor in muestra:
+                    datetime.strptime(valor, formato)
+                return formato
+            except ValueError:
+                continue
+        return None
+
+    def parsear_columna(self, serie: pd.Series) -> pd.Series:
+        """Convierte una columna de tiempos a datetime64 con el formato cacheado."""
+        if pd.api.types.is_datetime64_any_dtype(serie):
+            return serie
+
+        # Ruta epoch: enteros/flotantes -> escala fija a ns, sin parseo de texto
+        if pd.api.types.is_numeric_dtype(serie):
+            valores = serie.to_numpy()
+            if self.factor_epoch is None and len(valores):
+                self.factor_epoch = self._factor_epoch(abs(float(valores[0])))
+            factor = self.factor_epoch or 1
+            if pd.api.types.is_integer_dtype(serie):
+                ns = valores.astype(np.int64) * factor
+            else:
+                ns = np.round(valores * factor).astype(np.int64)
+            return pd.Series(ns.view('datetime64[ns]'), index=serie.index, name=serie.name)
+
+        if self.formato is None:
+            muestra = serie.dropna().astype(str).head(self.tam_muestra).tolist()
+            self.formato = self.detectar_formato(muestra)
+
+        if self.formato is not None:
+            try:
+                return pd.to_datetime(serie, format=self.formato)
+            except (ValueError, TypeError):
+                # El fichero cambió de formato: se vuelve a detectar en la próxima llamada
+                self.formato = None
+
+        return pd.to_datetime(serie, dayfirst=True)
+
+    def parsear_escalar(self, valor) -> int:
+        """Convierte una lectura suelta a nanosegundos desde epoch (ruta barata, sin pandas)."""
+        if isinstance(valor, str):
+            if self.formato is None:
+                self.formato = self.detectar_formato([valor])
+            if self.formato is not None:
+                try:
+                    return self._a_ns(datetime.strptime(valor, self.formato))
+                except ValueError:
+                    self.formato = None
+            return pd.to_datetime(valor, dayfirst=True).value
+
+        # pd.Timestamp ya trae los nanosegundos
+        if hasattr(valor, 'value') and isinstance(valor, datetime):
+            return valor.value
+        if isinstance(valor, datetime):
+            return self._a_ns(valor)
+        if isinstance(valor, np.datetime64):
+            return int(valor.astype('datetime64[ns]').view(np.int64))
+
+        # Epoch numérico
+        if self.factor_epoch is None:
+            self.factor_epoch = self._factor_epoch(abs(float(valor)))
+        if isinstance(valor, (int, np.integer)):
+            return int(valor) * self.factor_epoch
+        return int(round(float(valor) * self.factor_epoch))
+
+    def _a_ns(self, dt: datetime) -> int:
+        if dt.tzinfo is not None:
+            dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+        return ((dt - self._EPOCH) // self._UN_MICRO) * 1000
+
+    def _factor_epoch(self, magnitud: float) -> int:
+        for limite, factor in self._ESCALAS_EPOCH:
+            if magnitud < limite:
+                return factor
+        return 1
@@ -1,24 +1,137 @@
-from typing import List, Dict
+import logging
+import queue
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
 from interfaces import Suscriber
+from metricas import METRICAS
+from registro import emitir, LOGGER_RAIZ
+
+logger = logging.getLogger(f"{LOGGER_RAIZ}.publisher")
 
 
 class Publisher:
-    def __init__(self):
-        # Diccionario: Clave=Tema, Valor=Lista de Suscriptores
-        self._suscriptores: Dict[str, List[Suscriber]] = {}
+    def __init__(self, asincrono: bool = False, num_workers: int = 4,
+                 max_cola: int = 10_000, tam_lote: int = 256):
+        # Diccionario: Clave=Tema, Valor={suscriptor: None} (orden de alta, altas/bajas O(1)).
+        # La clave es el propio objeto, no su id(): un id reutilizado no pasa por suscrito
+        self._suscriptores: Dict[str, Dict[Suscriber, None]] = {}
+        # Instantánea inmutable por tema con suscriptores: se descarta tras una alta/baja
+        self._instantaneas: Dict[str, Tuple[Suscriber, ...]] = {}
+        self._lock = threading.Lock()
+
+        # Modo asíncrono: notificar() encola y un pool de hilos entrega los update()
+        self.asincrono = asincrono
+        self.tam_lote = tam_lote
+        self._cerrado = False
+        self._cola: Optional[queue.Queue] = None
+        self._workers: List[threading.Thread] = []
+        if asincrono:
+            self._cola = queue.Queue(maxsize=max_cola)  # Acotada: si se llena, notificar() espera
+            for i in range(num_workers):
+                worker = threading.Thread(target=self._trabajar, name=f"publisher-{i}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
 
     def suscribir(self, suscriptor: Suscriber, tema: str):
-        if tema not in self._suscriptores:
-            self._suscriptores[tema] = []
-        if suscriptor not in self._suscriptores[tema]:
-            self._suscriptores[tema].append(suscriptor)
-            print(f"DEBUG: Suscriptor añadido al tema '{tema}'.")
+        with self._lock:
+            suscriptores = self._suscriptores.setdefault(tema, {})
+            if suscriptor not in suscriptores:
+                suscriptores[suscriptor] = None
+                self._instantaneas.pop(tema, None)
+                emitir(logger, logging.DEBUG, f"Suscriptor añadido al tema '{tema}'.")
 
     def desuscribir(self, suscriptor: Suscriber, tema: str):
-        if tema in self._suscriptores and suscriptor in self._suscriptores[tema]:
-            self._suscriptores[tema].remove(suscriptor)
+        with self._lock:
+            suscriptores = self._suscriptores.get(tema)
+            if suscriptores is None or suscriptor not in suscriptores:
+                return
+            del suscriptores[suscriptor]
+            self._instantaneas.pop(tema, None)
+            if not suscriptores:
+                # Se fue el último suscriptor: el tema no se queda como diccionario vacío
+                del self._suscriptores[tema]
+
+    def notificar(self, incidencia: str, tema: str, timeout: Optional[float] = None):
+        """
+        Entrega la incidencia a los suscriptores del tema.
+        En modo asíncrono la encola en lotes de 'tam_lote' suscriptores; si la cola
+        está llena espera (backpressure) y con 'timeout' lanza queue.Full al agotarlo.
+        """
+        self.notificar_a(self._instantanea(tema), incidencia, timeout)
+
+    def notificar_a(self, destinatarios: Sequence[Suscriber], incidencia: str,
+                    timeout: Optional[float] = None):
+        """Entrega a un subconjunto concreto de suscriptores (mismo modo que notificar)."""
+        if not destinatarios:
+            return
+        METRICAS.contar('notificaciones', len(destinatarios))
+
+        with METRICAS.temporizador('notificacion_segundos'):
+            if self._cola is None:
+                for suscriptor in destinatarios:
+                    suscriptor.update(incidencia)
+                return
+
+            if self._cerrado:
+                raise RuntimeError("El Publisher está cerrado.")
+            for i in range(0, len(destinatarios), self.tam_lote):
+                self._cola.put((incidencia, destinatarios[i:i + self.tam_lote]), timeout=timeout)
+
+    def suscriptores(self, tema: str) -> Tuple[Suscriber, ...]:
+        """Suscriptores actuales del tema (instantánea inmutable)."""
+        return self._instantanea(tema)
+
+    def esta_suscrito(self, suscriptor: Suscriber, tema: Optional[str] = None) -> bool:
+        """Si el suscriptor está en el tema indicado (sin tema: en alguno)."""
+        with self._lock:
+            if tema is not None:
+                return suscriptor in self._suscriptores.get(tema, {})
+            return any(suscriptor in suscriptores for suscriptores in self._suscriptores.values())
+
+    def flush(self):
+        """Espera a que se hayan entregado todas las notificaciones encoladas."""
+        if self._cola is not None:
+            self._cola.join()
+
+    def cerrar(self):
+        """Entrega lo pendiente y detiene el pool de entrega."""
+        if self._cola is None or self._cerrado:
+            return
+        self._cerrado = True
+        self.flush()
+        for _ in self._workers:
+            self._cola.put(None)
+        for worker in self._workers:
+            worker.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    def _instantanea(self, tema: str) -> Tuple[Suscriber, ...]:
+        destinatarios = self._instantaneas.get(tema)
+        if destinatarios is None:
+            with self._lock:
+                destinatarios = tuple(self._suscriptores.get(tema, ()))
+                # Temas vacíos o desconocidos no se cachean: no crecen con cada tema consultado
+                if destinatarios:
+                    self._instantaneas[tema] = destinatarios
+        return destinatarios
 
-    def notificar(self, incidencia: str, tema: str):
-        if tema in self._suscriptores:
-            for suscriptor in self._suscriptores[tema]:
-                suscriptor.update(incidencia)
+    def _trabajar(self):
+        while True:
+            tarea = self._cola.get()
+            try:
+                if tarea is None:
+                    return
+                mensaje, destinatarios = tarea
+                for suscriptor in destinatarios:
+                    try:
+                        suscriptor.update(mensaje)
+                    except Exception as e:
+                        # Un suscriptor defectuoso no debe tumbar el hilo de entrega
+                        emitir(logger, logging.ERROR, f"Error notificando a un suscriptor: {e}")
+            finally:
+                self._cola.task_done()
@@ -0,0 +1,66 @@
+import logging
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+# Logger raíz del proyecto: 'is_p2.publisher', 'is_p2.cliente', ...
+LOGGER_RAIZ = 'is_p2'
+
+_usar_logging = False
+
+
+class FiltroTasa(logging.Filter):
+    """
+    Deja pasar como mucho 'max_por_segundo' registros por logger y nivel.
+    Al abrir un segundo nuevo, el primer registro indica cuántos se descartaron.
+    """
+
+    def __init__(self, max_por_segundo: int = 10):
+        super().__init__()
+        self.max_por_segundo = max_por_segundo
+        self._ventanas: Dict[Tuple[str, int], list] = {}  # clave -> [segundo, emitidos, descartados]
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        segundo = int(time.monotonic())
+        clave = (record.name, record.levelno)
+        with self._lock:
+            ventana = self._ventanas.get(clave)
+            if ventana is None or ventana[0] != segundo:
+                descartados = ventana[2] if ventana else 0
+                self._ventanas[clave] = [segundo, 1, 0]
+                if descartados:
+                    record.msg = f"{record.msg} (+{descartados} mensajes suprimidos)"
+                return True
+            if ventana[1] < self.max_por_segundo:
+                ventana[1] += 1
+                return True
+            ventana[2] += 1
+            return False
+
+
+def configurar_logging(nivel: int = logging.INFO, max_por_segundo: int = 10,
+                       handler: Optional[logging.Handler] = None):
+    """
+    Sustituye los print de Publisher y Cliente por logging con niveles y límite de tasa.
+    Sin llamar a esta función se mantiene la salida por consola de siempre.
+    """
+    global _usar_logging
+    handler = handler or logging.StreamHandler()
+    handler.addFilter(FiltroTasa(max_por_segundo))
+    handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+
+    logger = logging.getLogger(LOGGER_RAIZ)
+    logger.setLevel(nivel)
+    logger.addHandler(handler)
+    _usar_logging = True
+
+
+def emitir(logger: logging.Logger, nivel: int, mensaje: str):
+    """Escribe por logging si está configurado y, si no, con print como antes."""
+    if _usar_logging:
+        logger.log(nivel, mensaje)
+    elif nivel == logging.DEBUG:
+        print(f"DEBUG: {mensaje}")
+    else:
+        print(mensaje)
@@ -0,0 +1,188 @@
+import operator
+import numpy as np
+from dataclasses import dataclass, asdict, replace
+from typing import Dict, Hashable, List, Mapping, Optional, Sequence, Tuple
+from incidencias import TipoIncidencia
+
+# Comparación -> (versión escalar, versión vectorizada, comparación complementaria)
+OPERADORES = {
+    '>': (operator.gt, np.greater, '<='),
+    '>=': (operator.ge, np.greater_equal, '<'),
+    '<': (operator.lt, np.less, '>='),
+    '<=': (operator.le, np.less_equal, '>'),
+    '==': (operator.eq, np.equal, '!='),
+    '!=': (operator.ne, np.not_equal, '=='),
+}
+
+
+@dataclass(frozen=True)
+class Regla:
+    """
+    Regla determinista: genera 'tipo' cuando 'feature <operador> umbral'.
+    'umbrales_sensor' sustituye el umbral para sensores concretos.
+    'clase' es la etiqueta de entrenamiento (0: no etiqueta) y, si se indica 'tipo_ia',
+    una predicción de esa clase que la regla no confirma genera 'tipo_ia'.
+    """
+    nombre: str
+    feature: str
+    operador: str
+    umbral: float
+    tipo: TipoIncidencia
+    clase: int = 0
+    tipo_ia: Optional[TipoIncidencia] = None
+    umbrales_sensor: Tuple[Tuple[Hashable, float], ...] = ()
+
+    def __post_init__(self):
+        if self.operador not in OPERADORES:
+            raise ValueError(f"Operador no soportado en la regla '{self.nombre}': {self.operador}")
+
+    def a_dict(self) -> Dict:
+        datos = asdict(self)
+        datos['tipo'] = int(self.tipo)
+        datos['tipo_ia'] = None if self.tipo_ia is None else int(self.tipo_ia)
+        datos['umbrales_sensor'] = [list(par) for par in self.umbrales_sensor]
+        return datos
+
+    @classmethod
+    def desde_dict(cls, datos: Dict) -> 'Regla':
+        datos = dict(datos)
+        datos['tipo'] = TipoIncidencia(datos['tipo'])
+        if datos.get('tipo_ia') is not None:
+            datos['tipo_ia'] = TipoIncidencia(datos['tipo_ia'])
+        datos['umbrales_sensor'] = tuple(tuple(par) for par in datos.get('umbrales_sensor', ()))
+        return cls(**datos)
+
+
+class _ReglaCompilada:
+    """Lo que se consulta en cada evaluación, resuelto una sola vez."""
+
+    __slots__ = ('feature', 'escalar', 'vector', 'escalar_ia', 'vector_ia', 'umbral',
+                 'umbrales_sensor', 'codigo', 'clase', 'codigo_ia')
+
+    def __init__(self, regla: Regla):
+        self.feature = regla.feature
+        self.escalar, self.vector, complemento = OPERADORES[regla.operador]
+        # La IA solo añade lo que la regla no ve: la comparación complementaria (no ~máscara,
+        # para que un NaN no dispare ninguna de las dos)
+        self.escalar_ia, self.vector_ia, _ = OPERADORES[complemento]
+        self.umbral = float(regla.umbral)
+        self.umbrales_sensor = {s: float(u) for s, u in regla.umbrales_sensor} or None
+        self.codigo = TipoIncidencia(regla.tipo)
+        self.clase = regla.clase
+        self.codigo_ia = None if regla.tipo_ia is None else TipoIncidencia(regla.tipo_ia)
+
+
+class MotorReglas:
+    """
+    Conjunto ordenado de reglas compilado una vez para los dos modos:
+    máscaras NumPy (entrenamiento, lotes, evaluación) y un evaluador escalar para el
+    dato a dato. El orden de las reglas fija el orden de las incidencias dentro de
+    una lectura y la prioridad de las etiquetas (gana la primera regla que se cumple).
+    Es inmutable: con_umbral devuelve un motor nuevo.
+    """
+
+    def __init__(self, reglas: Sequence[Regla]):
+        self.reglas: Tuple[Regla, ...] = tuple(reglas)
+        nombres = [r.nombre for r in self.reglas]
+        if len(set(nombres)) != len(nombres):
+            raise ValueError("Los nombres de las reglas deben ser únicos.")
+        self._compiladas = tuple(_ReglaCompilada(r) for r in self.reglas)
+        self._ia = tuple(c for c in self._compiladas if c.codigo_ia is not None)
+
+    @classmethod
+    def por_defecto(cls, limite_tiempo_sec: float = 120, umbral_voltaje: float = 0.5) -> 'MotorReglas':
+        """Reglas de negocio RF2.1: bloqueo de datos y salto de tensión."""
+        return cls([
+            Regla('bloqueo_datos', 'delta_t', '>', limite_tiempo_sec,
+                  TipoIncidencia.BLOQUEO_DATOS, clase=1, tipo_ia=TipoIncidencia.POSIBLE_BLOQUEO_IA),
+            Regla('salto_voltaje', 'max_v_jump', '>=', umbral_voltaje,
+                  TipoIncidencia.SALTO_VOLTAJE, clase=2, tipo_ia=TipoIncidencia.POSIBLE_SALTO_IA),
+        ])
+
+    @classmethod
+    def desde_dicts(cls, datos: Sequence[Dict]) -> 'MotorReglas':
+        return cls([Regla.desde_dict(d) for d in datos])
+
+    def a_dicts(self) -> List[Dict]:
+        return [r.a_dict() for r in self.reglas]
+
+    def umbral(self, nombre: str) -> float:
+        return self._regla(nombre).umbral
+
+    def con_umbral(self, nombre: str, umbral: float) -> 'MotorReglas':
+        regla = self._regla(nombre)
+        return MotorReglas([replace(r, umbral=umbral) if r is regla else r for r in self.reglas])
+
+    def _regla(self, nombre: str) -> Regla:
+        for regla in self.reglas:
+            if regla.nombre == nombre:
+                return regla
+        raise KeyError(f"No existe la regla '{nombre}'.")
+
+    # --- MODO VECTORIZADO ---
+    def detectar(self, features: Mapping[str, np.ndarray], prediccion: Optional[np.ndarray] = None,
+                 sensores: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Incidencias de un lote como (filas, códigos, valores), ordenadas por fila y, dentro
+        de la fila, por regla (primero las deterministas y después las de la IA), igual que
+        detectar_escalar lectura a lectura. 'valor' es la feature de la regla en esa fila.
+        """
+        mascaras = []
+        for c in self._compiladas:
+            x = np.asarray(features[c.feature])
+            mascaras.append((c.vector(x, self._umbrales(c, len(x), sensores)), c.codigo, x))
+        if prediccion is not None:
+            for c in self._ia:
+                x = np.asarray(features[c.feature])
+                mascara = (prediccion == c.clase) & c.vector_ia(x, self._umbrales(c, len(x), sensores))
+                mascaras.append((mascara, c.codigo_ia, x))
+        if not mascaras:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int8), np.empty(0)
+
+        filas = [np.flatnonzero(m) for m, _, _ in mascaras]
+        orden_regla = np.concatenate([np.full(len(f), i) for i, f in enumerate(filas)])
+        filas_todas = np.concatenate(filas)
+        orden = np.lexsort((orden_regla, filas_todas))
+
+        codigos = np.array([codigo for _, codigo, _ in mascaras], dtype=np.int8)
+        valores = np.concatenate([x[f] for (_, _, x), f in zip(mascaras, filas)])
+        return filas_todas[orden], codigos[orden_regla[orden]], valores[orden].astype(np.float64)
+
+    def etiquetar(self, features: Mapping[str, np.ndarray], sensores: Optional[np.ndarray] = None) -> np.ndarray:
+        """Clase por fila (0: Normal): la de la primera regla con clase que se cumple."""
+        y = None
+        for c in self._compiladas:
+            x = np.asarray(features[c.feature], dtype=np.float64)
+            if y is None:
+                y = np.zeros(len(x))
+            if c.clase:
+                y[c.vector(x, self._umbrales(c, len(x), sensores)) & (y == 0)] = c.clase
+        return np.zeros(0) if y is None else y
+
+    @staticmethod
+    def _umbrales(c: _ReglaCompilada, n: int, sensores: Optional[np.ndarray]):
+        if c.umbrales_sensor is None or sensores is None:
+            return c.umbral
+        umbrales = np.full(n, c.umbral)
+        for sensor, umbral in c.umbrales_sensor.items():
+            umbrales[sensores == sensor] = umbral
+        return umbrales
+
+    # --- MODO ESCALAR (dato a dato) ---
+    def detectar_escalar(self, features: Mapping[str, float], prediccion: Optional[int] = None,
+                         sensor: Hashable = None) -> List[Tuple[TipoIncidencia, float]]:
+        """Mismas incidencias que detectar para una sola lectura, como (tipo, valor)."""
+        incidencias = []
+        for c in self._compiladas:
+            x = features[c.feature]
+            umbral = c.umbral if c.umbrales_sensor is None else c.umbrales_sensor.get(sensor, c.umbral)
+            if c.escalar(x, umbral):
+                incidencias.append((c.codigo, x))
+        if prediccion is not None:
+            for c in self._ia:
+                if prediccion == c.clase:
+                    x = features[c.feature]
+                    umbral = c.umbral if c.umbrales_sensor is None else c.umbrales_sensor.get(sensor, c.umbral)
+                    if c.escalar_ia(x, umbral):
+                        incidencias.append((c.codigo_ia, x))
+        return incidencias
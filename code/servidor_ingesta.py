@@ -0,0 +1,239 @@
+import argparse
+import asyncio
+import json
+import logging
+import struct
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Union
+from modulo_inteligente import ModuloInteligente
+from motor_deteccion import MotorDeteccion
+from publisher import Publisher
+from coalescedor import CoalescedorAlertas
+from metricas import METRICAS
+from registro import emitir, LOGGER_RAIZ
+
+logger = logging.getLogger(f"{LOGGER_RAIZ}.ingesta")
+
+# --- PROTOCOLO ---
+# ndjson:  una lectura JSON por línea {"seq", "timestamp", "voltageReceiver1", "voltageReceiver2",
+#          "status", ["sensor"]}; el servidor responde {"ack": <último seq procesado>}\n
+# binario: frames [uint32 nº lecturas][lecturas DTYPE_BINARIO]; responde int64 con el último seq
+DTYPE_BINARIO = np.dtype([
+    ('seq', '<i8'),
+    ('sensor', '<i8'),
+    ('timestamp', '<i8'),  # ns desde epoch
+    ('voltageReceiver1', '<f8'),  # mV, como llega del sensor
+    ('voltageReceiver2', '<f8'),
+    ('status', '<f8'),
+])
+CABECERA_BINARIA = struct.Struct('<I')
+ACK_BINARIO = struct.Struct('<q')
+
+
+@dataclass
+class _Paquete:
+    """Lecturas recibidas de una conexión en una sola lectura del socket/frame."""
+    writer: asyncio.StreamWriter
+    lecturas: Union[List[Dict], np.ndarray]
+    ultimo_seq: int
+
+
+class ServidorIngesta:
+    """
+    Front-end asyncio de ingesta en tiempo real (TCP o socket Unix).
+    Agrupa lecturas por tamaño o plazo, las pasa a ModuloInteligente.predecir_lote
+    (o a MotorDeteccion si hay varios sensores) en un hilo aparte y publica las
+    incidencias a través del coalescedor. La cola acotada hace de backpressure:
+    si se llena se deja de leer del socket y TCP frena al emisor.
+    """
+
+    def __init__(self, modulo: ModuloInteligente, publisher: Optional[Publisher] = None,
+                 coalescedor: Optional[CoalescedorAlertas] = None,
+                 motor: Optional[MotorDeteccion] = None, tema: str = "Mantenimiento",
+                 formato: str = 'ndjson', tam_lote: int = 1000, plazo: float = 0.05,
+                 max_cola: int = 1000):
+        if formato not in ('ndjson', 'binario'):
+            raise ValueError(f"Formato desconocido: {formato}")
+        self.modulo = modulo
+        self.motor = motor
+        self.publisher = publisher or Publisher()
+        self.coalescedor = coalescedor or CoalescedorAlertas(self.publisher)
+        self.tema = tema
+        self.formato = formato
+        self.tam_lote = tam_lote
+        self.plazo = plazo
+        self.max_cola = max_cola
+
+        self._cola: Optional[asyncio.Queue] = None
+        self._servidores: List[asyncio.AbstractServer] = []
+        self._agrupador: Optional[asyncio.Task] = None
+        # Un solo hilo: el detector es stateful y los lotes deben procesarse en orden
+        self._ejecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="deteccion")
+
+    async def iniciar_tcp(self, host: str = '127.0.0.1', puerto: int = 9009) -> asyncio.AbstractServer:
+        self._preparar()
+        servidor = await asyncio.start_server(self._atender, host, puerto)
+        self._servidores.append(servidor)
+        return servidor
+
+    async def iniciar_unix(self, ruta: str) -> asyncio.AbstractServer:
+        self._preparar()
+        servidor = await asyncio.start_unix_server(self._atender, ruta)
+        self._servidores.append(servidor)
+        return servidor
+
+    async def servir(self):
+        await asyncio.gather(*(s.serve_forever() for s in self._servidores))
+
+    async def cerrar(self):
+        for servidor in self._servidores:
+            servidor.close()
+            await servidor.wait_closed()
+        if self._cola is not None:
+            await self._cola.join()
+        if self._agrupador is not None:
+            self._agrupador.cancel()
+        self._ejecutor.shutdown()
+        # Los resúmenes pendientes salen al cerrar
+        self.coalescedor.detener()
+
+    def _preparar(self):
+        if self._cola is None:
+            self._cola = asyncio.Queue(maxsize=self.max_cola)
+            self._agrupador = asyncio.create_task(self._agrupar())
+            # Resúmenes de alertas suprimidas aunque deje de llegar tráfico
+            self.coalescedor.iniciar()
+
+    async def _atender(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            if self.formato == 'binario':
+                await self._leer_binario(reader, writer)
+            else:
+                await self._leer_ndjson(reader, writer)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _leer_ndjson(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        resto = b''
+        while datos := await reader.read(1 << 16):
+            # Se procesan todas las líneas completas disponibles de una vez
+            *lineas, resto = (resto + datos).split(b'\n')
+            lecturas = []
+            for linea in lineas:
+                if not linea.strip():
+                    continue
+                try:
+                    lectura = json.loads(linea)
+                    if not isinstance(lectura, dict):
+                        raise ValueError("no es un objeto JSON")
+                except ValueError as e:
+                    # Una línea corrupta no debe cerrar la conexión del cliente
+                    emitir(logger, logging.WARNING, f"Línea NDJSON descartada ({e}): {linea[:80]!r}")
+                    continue
+                lecturas.append(lectura)
+            if lecturas:
+                await self._cola.put(_Paquete(writer, lecturas, lecturas[-1].get('seq', -1)))
+
+    async def _leer_binario(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        while True:
+            try:
+                cabecera = await reader.readexactly(CABECERA_BINARIA.size)
+            except asyncio.IncompleteReadError:
+                return
+            (n,) = CABECERA_BINARIA.unpack(cabecera)
+            cuerpo = await reader.readexactly(n * DTYPE_BINARIO.itemsize)
+            lecturas = np.frombuffer(cuerpo, dtype=DTYPE_BINARIO)
+            if n:
+                await self._cola.put(_Paquete(writer, lecturas, int(lecturas['seq'][-1])))
+
+    async def _agrupar(self):
+        """Cierra un lote al llegar a 'tam_lote' lecturas o al vencer 'plazo' segundos."""
+        loop = asyncio.get_running_loop()
+        while True:
+            lote = [await self._cola.get()]
+            n = len(lote[0].lecturas)
+            limite = loop.time() + self.plazo
+            while n < self.tam_lote:
+                restante = limite - loop.time()
+                if restante <= 0:
+                    break
+                try:
+                    paquete = await asyncio.wait_for(self._cola.get(), restante)
+                except asyncio.TimeoutError:
+                    break
+                lote.append(paquete)
+                n += len(paquete.lecturas)
+
+            try:
+                await loop.run_in_executor(self._ejecutor, self._procesar_lote, lote)
+                self._confirmar(lote)
+            except Exception as e:
+                # Un lote corrupto no debe parar la ingesta (no se confirma)
+                emitir(logger, logging.ERROR, f"Error procesando lote de ingesta: {e}")
+            finally:
+                for _ in lote:
+                    self._cola.task_done()
+
+    def _procesar_lote(self, lote: List[_Paquete]):
+        if self.formato == 'binario':
+            datos = pd.DataFrame(np.concatenate([p.lecturas for p in lote]))
+        else:
+            datos = pd.DataFrame([lectura for p in lote for lectura in p.lecturas])
+        METRICAS.contar('lecturas_ingestadas', len(datos))
+
+        if self.motor is not None:
+            incidencias = self.motor.procesar(datos)
+        else:
+            incidencias = self.modulo.predecir_lote(datos)
+        if incidencias:
+            self.coalescedor.procesar(incidencias, self.tema)
+
+    def _confirmar(self, lote: List[_Paquete]):
+        ultimos: Dict[asyncio.StreamWriter, int] = {}
+        for paquete in lote:
+            ultimos[paquete.writer] = paquete.ultimo_seq
+        for writer, seq in ultimos.items():
+            if writer.is_closing():
+                continue
+            if self.formato == 'binario':
+                writer.write(ACK_BINARIO.pack(seq))
+            else:
+                writer.write(json.dumps({'ack': seq}).encode() + b'\n')
+
+
+async def _main(args):
+    modulo = ModuloInteligente()
+    if args.modelo:
+        modulo.cargar_modelo(args.modelo)
+    motor = MotorDeteccion(modulo) if args.multisensor else None
+    servidor = ServidorIngesta(modulo, motor=motor, formato=args.formato,
+                               tam_lote=args.tam_lote, plazo=args.plazo, max_cola=args.max_cola)
+    if args.unix:
+        await servidor.iniciar_unix(args.unix)
+        print(f"Servidor de ingesta escuchando en unix:{args.unix} ({args.formato})")
+    else:
+        host, puerto = args.tcp.rsplit(':', 1)
+        await servidor.iniciar_tcp(host, int(puerto))
+        print(f"Servidor de ingesta escuchando en {args.tcp} ({args.formato})")
+    await servidor.servir()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor asyncio de ingesta de lecturas.")
+    parser.add_argument('--tcp', default='127.0.0.1:9009', help="host:puerto")
+    parser.add_argument('--unix', help="Ruta de socket Unix (sustituye a --tcp)")
+    parser.add_argument('--formato', choices=['ndjson', 'binario'], default='ndjson')
+    parser.add_argument('--modelo', help="Modelo guardado con ModuloInteligente.guardar_modelo")
+    parser.add_argument('--multisensor', action='store_true', help="Usa MotorDeteccion por sensor")
+    parser.add_argument('--tam-lote', type=int, default=1000)
+    parser.add_argument('--plazo', type=float, default=0.05)
+    parser.add_argument('--max-cola', type=int, default=1000)
+    try:
+        asyncio.run(_main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
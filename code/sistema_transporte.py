@@ -1,24 +1,191 @@
-from typing import List
+import os
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 from cliente import Cliente
-from lector_csv import LectorCSV
-from visualizador import VisualizadorIncidencias
-from modulo_inteligente import ModuloInteligente
 from publisher import Publisher
+from coalescedor import CoalescedorAlertas
+from almacen_incidencias import AlmacenIncidencias
+from metricas import METRICAS
+from interfaces import Exportador
+
+if TYPE_CHECKING:
+    from almacen_historico import AlmacenHistorico
+    from incidencias import Incidencia
+    from lector_csv import LectorCSV
+    from modulo_inteligente import ModuloInteligente
+    from visualizador import VisualizadorIncidencias
 
 
 class SistemaTransporte:
-    def __init__(self):
+    """
+    Lector, visualizador y módulo inteligente se crean en su primer uso: un proceso que
+    solo gestiona suscripciones y notificaciones no importa pandas, matplotlib ni xgboost.
+    """
+
+    def __init__(self, ruta_modelo: Optional[str] = None, directorio_graficas: str = 'graficas',
+                 directorio_historico: Optional[str] = None, graficas_interactivas: bool = False):
         self.catalogo_clientes: List[Cliente] = []
-        self.lector_csv = LectorCSV()
-        self.visualizador = VisualizadorIncidencias()
-        self.modulo_inteligente = ModuloInteligente()
+        self._lector_csv: Optional['LectorCSV'] = None
+        # Por defecto las gráficas se guardan en segundo plano (Agg, sin pantalla); abrir
+        # ventanas con plt.show bloquea el proceso y hay que pedirlo con graficas_interactivas
+        self.directorio_graficas = directorio_graficas
+        self.graficas_interactivas = graficas_interactivas
+        self._visualizador: Optional['VisualizadorIncidencias'] = None
+        self._modulo_inteligente: Optional['ModuloInteligente'] = None
         self.publisher = Publisher()
+        # Deduplicación y límites de tasa entre la detección dato a dato y el Publisher
+        self.coalescedor = CoalescedorAlertas(self.publisher)
+        # Conteos acumulados y últimas incidencias para informes (memoria acotada)
+        self.almacen = AlmacenIncidencias()
         self.datos_actuales = None
+        # Modo por bloques: (ruta, chunksize) para recorrer el CSV con memoria constante
+        self.fuente_stream: Optional[Tuple[str, int]] = None
+        # Histórico persistente por sensor y día: cada carga se le añade y de él leen
+        # las estadísticas y el reentrenamiento
+        self.directorio_historico = directorio_historico
+        self._historico: Optional['AlmacenHistorico'] = None
+        self.sensor_actual: Optional[str] = None
+
+        # Arranque en caliente: si hay un modelo guardado no se reentrena (se carga en el primer uso)
+        self.ruta_modelo = ruta_modelo
+
+    @property
+    def lector_csv(self) -> 'LectorCSV':
+        if self._lector_csv is None:
+            from lector_csv import LectorCSV
+            self._lector_csv = LectorCSV()
+        return self._lector_csv
 
-    def carga_datos(self, ruta_archivo: str):
-        self.lector_csv.ruta_archivo = ruta_archivo
-        self.datos_actuales = self.lector_csv.leer()
-        print("Datos cargados en el sistema.")
+    @property
+    def visualizador(self) -> 'VisualizadorIncidencias':
+        if self._visualizador is None:
+            from visualizador import VisualizadorIncidencias
+            self._visualizador = VisualizadorIncidencias(
+                None if self.graficas_interactivas else self.directorio_graficas)
+        return self._visualizador
+
+    @property
+    def historico(self) -> Optional['AlmacenHistorico']:
+        if self._historico is None and self.directorio_historico:
+            from almacen_historico import AlmacenHistorico
+            self._historico = AlmacenHistorico(self.directorio_historico)
+        return self._historico
+
+    @property
+    def modulo_inteligente(self) -> 'ModuloInteligente':
+        if self._modulo_inteligente is None:
+            from modulo_inteligente import ModuloInteligente
+            modulo = ModuloInteligente()
+            if self.ruta_modelo and os.path.exists(self.ruta_modelo):
+                modulo.cargar_modelo(self.ruta_modelo)
+            self._modulo_inteligente = modulo
+        return self._modulo_inteligente
+
+    def carga_datos(self, ruta_archivo: str, chunksize: Optional[int] = None, sensor: Optional[str] = None):
+        self.sensor_actual = sensor
+        if chunksize:
+            # No se materializa el fichero: la detección lo recorrerá por bloques
+            self.datos_actuales = None
+            self.fuente_stream = (ruta_archivo, chunksize)
+            print(f"Datos enlazados en modo stream (bloques de {chunksize} filas).")
+        else:
+            self.fuente_stream = None
+            with METRICAS.temporizador('carga_datos_segundos'):
+                self.datos_actuales = self.lector_csv.leer(ruta_archivo)
+            print("Datos cargados en el sistema.")
+
+        if self.historico is not None:
+            self._ingerir_historico(ruta_archivo, chunksize, sensor)
+
+    def _ingerir_historico(self, ruta_archivo: str, chunksize: Optional[int], sensor: Optional[str]):
+        """Añade el CSV al histórico una sola vez (se reconoce por ruta, tamaño y mtime)."""
+        stat = os.stat(ruta_archivo)
+        firma = f"{os.path.abspath(ruta_archivo)}|{stat.st_size}|{stat.st_mtime_ns}|{sensor}"
+        if self.historico.tiene_fuente(firma):
+            print("El fichero ya estaba en el histórico.")
+            return
+
+        with METRICAS.temporizador('historico_segundos'):
+            if self.datos_actuales is not None:
+                filas = self.historico.anexar(self.datos_actuales, sensor)
+            else:
+                filas = sum(self.historico.anexar(bloque, sensor)
+                            for bloque in self.lector_csv.leer_stream(ruta_archivo, chunksize))
+        if filas:
+            self.historico.registrar_fuente(firma)
+        print(f"{filas} lecturas añadidas al histórico.")
+
+    def entrenar_modelo(self, continuar: bool = True, abortar_si_rss_mb: Optional[float] = None,
+                        inicio=None, fin=None):
+        """
+        Entrena (o continúa entrenando) y guarda el modelo. Con histórico se entrena con
+        sus lecturas en [inicio, fin), partición a partición; si no, con los datos cargados.
+        En modo stream el fichero se recorre por bloques sin cargarlo entero.
+        'abortar_si_rss_mb' detiene el entrenamiento si, tras un bloque, el RSS lo supera.
+        """
+        if self.historico is not None and self.historico.sensores():
+            if not self._entrenar_historico(continuar, abortar_si_rss_mb, inicio, fin):
+                return
+        elif self.fuente_stream is not None:
+            ruta_archivo, chunksize = self.fuente_stream
+            self.modulo_inteligente.entrenar_stream(
+                lambda: self.lector_csv.leer_stream(ruta_archivo, chunksize),
+                continuar=continuar, abortar_si_rss_mb=abortar_si_rss_mb)
+        elif self.datos_actuales is not None:
+            self.modulo_inteligente.entrenar(self.datos_actuales, continuar=continuar)
+        else:
+            print("No hay datos cargados.")
+            return
+        if self.ruta_modelo:
+            self.modulo_inteligente.guardar_modelo(self.ruta_modelo)
+
+    def _entrenar_historico(self, continuar: bool, abortar_si_rss_mb: Optional[float], inicio, fin) -> bool:
+        """
+        Entrena con el histórico. Al continuar un modelo ya entrenado solo se le dan las
+        lecturas posteriores a su marca de agua (entrenado_hasta, por sensor), para no
+        repetirle datos ya vistos; sin continuar se recorre el histórico entero.
+        Las lecturas que lleguen con fecha anterior a la marca no se vuelven a ver.
+        Devuelve False si no había lecturas nuevas.
+        """
+        import pandas as pd
+
+        modulo = self.modulo_inteligente
+        marcas = modulo.entrenado_hasta if continuar and modulo.is_trained else {}
+        ini_ns = None if inicio is None else pd.Timestamp(inicio).as_unit('ns').value
+        fin_ns = None if fin is None else pd.Timestamp(fin).as_unit('ns').value
+
+        # 1. Desde dónde leer cada sensor (ns; None: desde el principio)
+        desde: Dict[str, Optional[int]] = {}
+        for sensor in self.historico.sensores():
+            rango = self.historico.rango_temporal(sensor)
+            marca = marcas.get(sensor)
+            limites = [x for x in (ini_ns, None if marca is None else marca + 1) if x is not None]
+            ini_sensor = max(limites) if limites else None
+            if rango is None or (ini_sensor is not None and rango[1].value < ini_sensor):
+                continue
+            if fin_ns is not None and rango[0].value >= fin_ns:
+                continue
+            desde[sensor] = ini_sensor
+        if not desde:
+            print("No hay lecturas nuevas en el histórico desde el último entrenamiento.")
+            return False
+
+        # 2. Entrenar registrando la última lectura entregada de cada sensor
+        vistas: Dict[str, int] = {}
+
+        def bloques():
+            for sensor, ini_sensor in desde.items():
+                for bloque in self.historico.leer_stream(ini_sensor, fin, sensor):
+                    ultima = int(bloque['timestamp'].iloc[-1].value)
+                    vistas[sensor] = max(vistas.get(sensor, ultima), ultima)
+                    yield bloque
+
+        modulo.entrenar_stream(bloques, continuar=continuar, abortar_si_rss_mb=abortar_si_rss_mb)
+        modulo.entrenado_hasta = {**modulo.entrenado_hasta, **vistas}
+        return True
+
+    def exportar_metricas(self, exportador: Exportador):
+        """Vuelca carga, features, predicción y notificación al exportador indicado."""
+        METRICAS.exportar(exportador)
 
     def suscribir_usuario(self, usuario: Cliente, tipo_incidencia: str):
         self.publisher.suscribir(usuario, tipo_incidencia)
@@ -28,26 +195,70 @@ class SistemaTransporte:
     def desuscribir_usuario(self, usuario: Cliente, tipo_incidencia: str):
         self.publisher.desuscribir(usuario, tipo_incidencia)
 
-    def ver_estadisticas(self, usuario: Cliente):
+    def ver_estadisticas(self, usuario: Cliente, inicio=None, fin=None):
         # AQUI LA USAMOS: Imprimimos quién solicita la gráfica
         print(f"Generando reporte estadístico solicitado por: {usuario.email}")
 
-        if self.datos_actuales is not None:
+        resumen = self.almacen.resumen()
+        print(f"Incidencias registradas: {resumen['total']}")
+        for tipo, n in resumen['por_tipo'].items():
+            print(f"  {tipo}: {n}")
+        if resumen['por_tipo']:
+            self.visualizador.generar_grafica_incidencias(resumen['por_tipo'])
+
+        if self.historico is not None and self.historico.sensores():
+            # Tendencia desde los agregados por minuto: no se releen las lecturas
+            rango = self.historico.rango_temporal()
+            if rango is not None:
+                print(f"Histórico: {rango[0]} - {rango[1]}")
+            self.visualizador.generar_grafica_tendencia(
+                self.historico.tendencia(inicio, fin, self.sensor_actual))
+        elif self.datos_actuales is not None:
             self.visualizador.generar_grafica_tendencia(self.datos_actuales)
         else:
             print("No hay datos cargados.")
 
     def detectar_y_notificar(self):
         print("--- Iniciando ciclo de detección ---")
-        if self.datos_actuales is None:
+        if self.fuente_stream is None and self.datos_actuales is None:
             return
 
-        incidencias = self.modulo_inteligente.analizar_todo(self.datos_actuales)
+        # Conteos del ciclo = diferencia de los agregados (sin guardar la lista de incidencias)
+        antes = self.almacen.conteo_tipos()
+        with METRICAS.temporizador('deteccion_segundos'):
+            if self.fuente_stream is not None:
+                self._analizar_stream(*self.fuente_stream)
+            else:
+                self.almacen.registrar(self.modulo_inteligente.analizar_todo(self.datos_actuales))
+        conteos = self.almacen.conteo_tipos() - antes
 
-        if incidencias:
-            print(f"Se detectaron {len(incidencias)} incidencias.")
-            mensaje = f"Alertas: {', '.join(set(incidencias))}"
+        if conteos:
+            print(f"Se detectaron {sum(conteos.values())} incidencias.")
+            mensaje = f"Alertas: {', '.join(sorted(conteos))}"
             self.publisher.notificar(mensaje, "Mantenimiento")
-            self.visualizador.generar_grafica_incidencias(incidencias)
+            self.visualizador.generar_grafica_incidencias(conteos)
         else:
             print("Sistema estable.")
+
+    def procesar_lectura(self, lectura: dict, tema: str = "Mantenimiento") -> List['Incidencia']:
+        """Detección en tiempo real de una lectura; las alertas pasan por el coalescedor."""
+        incidencias = self.modulo_inteligente.predecir_tiempo_real(lectura)
+        if incidencias:
+            self.almacen.registrar(incidencias)
+            # Los resúmenes de lo suprimido se envían aunque deje de haber incidencias
+            self.coalescedor.iniciar()
+            self.coalescedor.procesar(incidencias, tema)
+        return incidencias
+
+    def cerrar(self):
+        """Envía los resúmenes pendientes y entrega las notificaciones encoladas."""
+        self.coalescedor.detener()
+        self.publisher.cerrar()
+
+    def _analizar_stream(self, ruta_archivo: str, chunksize: int) -> int:
+        """Detección bloque a bloque enlazando cada bloque con el anterior; solo se guardan agregados."""
+        total = 0
+        self.modulo_inteligente.ultimo_estado = None
+        for bloque in self.lector_csv.leer_stream(ruta_archivo, chunksize):
+            total += self.almacen.registrar(self.modulo_inteligente.analizar_todo(bloque, continuar=True))
+        return total
@@ -1,29 +1,139 @@
-import matplotlib.pyplot as plt
-from typing import List
-import pandas as pd
+import os
+import numpy as np
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import TYPE_CHECKING, Callable, List, Mapping, Optional, Tuple, Union
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+RECEPTORES = ['voltageReceiver1', 'voltageReceiver2']
+
+
+def reducir_min_max(x: np.ndarray, y: np.ndarray, n_cubetas: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Reduce una serie ordenada por x a como mucho 2 puntos por cubeta (su mínimo y su
+    máximo, en el orden original). Con una cubeta por píxel el dibujo conserva los
+    mismos picos que la serie completa.
+    """
+    validos = ~np.isnan(y)
+    x = x[validos]
+    y = y[validos]
+    if len(x) <= 2 * n_cubetas:
+        return x, y
+
+    # Cubetas de igual ancho en el eje x (en float para no desbordar int64 con ns)
+    rango = float(x[-1] - x[0]) + 1.0
+    cubeta = ((x - x[0]) / rango * n_cubetas).astype(np.int64)
+
+    # Dentro de cada cubeta, ordenado por valor: el primero es el mínimo y el último el máximo
+    orden = np.lexsort((y, cubeta))
+    cubeta_ordenada = cubeta[orden]
+    inicio = np.flatnonzero(np.r_[True, cubeta_ordenada[1:] != cubeta_ordenada[:-1]])
+    fin = np.r_[inicio[1:], len(orden)] - 1
+    indices = np.unique(np.concatenate([orden[inicio], orden[fin]]))
+    return x[indices], y[indices]
 
 
 class VisualizadorIncidencias:
-    def generar_grafica_incidencias(self, incidencias: List[str]):
-        if not incidencias:
-            return
+    """
+    Sin 'directorio_salida' muestra las gráficas en pantalla (plt.show, bloqueante).
+    Con 'directorio_salida' las renderiza con Agg a ficheros PNG/SVG en un hilo aparte:
+    los métodos devuelven un Future con la ruta y la detección no espera al dibujo.
+    matplotlib se importa al dibujar la primera gráfica, no al crear el visualizador.
+    """
 
-        conteos = {x: incidencias.count(x) for x in incidencias}
-        plt.figure(figsize=(6, 4))
+    def __init__(self, directorio_salida: Optional[str] = None, formato: str = 'png',
+                 tamano: Tuple[float, float] = (12, 5), dpi: int = 100):
+        if formato not in ('png', 'svg'):
+            raise ValueError(f"Formato de gráfica no soportado: {formato}")
+        self.directorio_salida = directorio_salida
+        self.formato = formato
+        self.tamano = tamano
+        self.dpi = dpi
+        self._ejecutor: Optional[ThreadPoolExecutor] = None
 
-        # CAMBIO AQUÍ: Envolvemos en list(...)
-        claves = list(conteos.keys())
-        valores = list(conteos.values())
+    @property
+    def ancho_px(self) -> int:
+        return int(self.tamano[0] * self.dpi)
 
-        plt.bar(claves, valores, color="salmon")
-        plt.title("Reporte de Incidencias")
+    def generar_grafica_incidencias(self, incidencias: Union[Mapping[str, int], List[str]]) -> Optional[Future]:
+        """Acepta los conteos por tipo ya agregados (p. ej. de AlmacenIncidencias) o una lista de tipos."""
+        if not incidencias:
+            return None
+
+        conteos = dict(incidencias) if isinstance(incidencias, Mapping) else Counter(incidencias)
         print("Generando gráfica de incidencias...")
-        plt.show()
+        return self._dibujar('incidencias', self._dibujar_incidencias, conteos)
+
+    def generar_grafica_tendencia(self, datos: 'pd.DataFrame') -> Optional[Future]:
+        if datos is None or datos.empty:
+            return None
 
-    def generar_grafica_tendencia(self, datos: pd.DataFrame):
-        plt.figure(figsize=(10, 5))
-        plt.plot(datos["tiempo"], datos["voltaje"], label="Voltaje")
-        plt.title("Tendencia de Voltaje en el Tiempo")
-        plt.legend()
+        # Solo se pasan los arrays al hilo; la reducción a la resolución de la imagen se hace allí
+        ts_ns = datos['timestamp'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+        series = {col: datos[col].to_numpy(dtype=np.float64) for col in RECEPTORES if col in datos.columns}
         print("Generando gráfica de tendencia...")
-        plt.show()
+        return self._dibujar('tendencia', self._dibujar_tendencia, ts_ns, series)
+
+    def esperar(self):
+        """Espera a que terminen las gráficas pendientes."""
+        if self._ejecutor is not None:
+            self._ejecutor.shutdown(wait=True)
+            self._ejecutor = None
+
+    cerrar = esperar
+
+    def _dibujar(self, nombre: str, funcion: Callable, *args) -> Optional[Future]:
+        if self.directorio_salida is None:
+            import matplotlib.pyplot as plt
+            figura = plt.figure(figsize=self.tamano)
+            funcion(figura, *args)
+            plt.show()
+            return None
+
+        if self._ejecutor is None:
+            # Un solo hilo: las gráficas se generan en orden y sin competir con la detección
+            self._ejecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="graficas")
+        futuro = self._ejecutor.submit(self._guardar, nombre, funcion, *args)
+        futuro.add_done_callback(self._informar)
+        return futuro
+
+    def _guardar(self, nombre: str, funcion: Callable, *args) -> str:
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        # Figure + FigureCanvasAgg no pasan por pyplot: sin ventanas ni estado global
+        figura = Figure(figsize=self.tamano, dpi=self.dpi)
+        FigureCanvasAgg(figura)
+        funcion(figura, *args)
+        os.makedirs(self.directorio_salida, exist_ok=True)
+        ruta = os.path.join(self.directorio_salida,
+                            f"{nombre}_{datetime.now():%Y%m%d_%H%M%S_%f}.{self.formato}")
+        figura.savefig(ruta, format=self.formato)
+        return ruta
+
+    @staticmethod
+    def _informar(futuro: Future):
+        error = futuro.exception()
+        if error is not None:
+            print(f"Error generando gráfica: {error}")
+        else:
+            print(f"Gráfica guardada en {futuro.result()}")
+
+    @staticmethod
+    def _dibujar_incidencias(figura, conteos: dict):
+        ejes = figura.add_subplot()
+        ejes.bar(list(conteos.keys()), list(conteos.values()), color="salmon")
+        ejes.set_title("Reporte de Incidencias")
+
+    def _dibujar_tendencia(self, figura, ts_ns: np.ndarray, series: dict):
+        ejes = figura.add_subplot()
+        for col, valores in series.items():
+            x, y = reducir_min_max(ts_ns, valores, self.ancho_px)
+            ejes.plot(x.astype('datetime64[ns]'), y, label=col, linewidth=0.8)
+        ejes.set_title("Tendencia de Voltaje en el Tiempo")
+        ejes.set_ylabel("V")
+        ejes.legend()
+        figura.autofmt_xdate()